@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark and cross-check for slack-notification-context.py.
+
+Generates synthetic Slack logs (browser.log plus a rotated browser1.log) of
+increasing size under a throwaway directory. The logs contain chatty
+non-notification lines, pretty-printed NEW_NOTIFICATION blocks, some
+malformed JSON, equal-distance ties and a block still being written at EOF.
+For each size it resolves the same targets with every scan strategy:
+
+    full         the reference whole-file regex scan
+    tail         reverse chunked scan from EOF
+    index-cold   sidecar index built from nothing (first click after rotation)
+    index-warm   index file present, loaded per call (one-shot CLI)
+    index-mem    index already in memory (the serve daemon)
+
+It asserts that every strategy returns the same deep link as full, then
+prints per-strategy median and p95 lookup latency and the peak Python heap of
+one lookup, as JSON. Exits 1 on any mismatch.
+
+Usage:
+    slack-notification-context-bench.py [--sizes MB,...] [--queries N] [--checks N]
+                                        [--seed N] [--keep]
+"""
+
+import argparse
+import importlib.util
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+HELPER = next((p for p in (HERE / "slack-notification-context.py",
+                           HERE / "executable_slack-notification-context.py") if p.is_file()), None)
+TOLERANCE = 3.0
+
+
+def load_helper(root):
+    spec = importlib.util.spec_from_file_location("slack_notification_context", HELPER)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    mod.LOG_DIR = root / "logs"
+    mod.CACHE_DIR = root / "cache"
+    mod.INDEX_PATH = mod.CACHE_DIR / "index.json"
+    return mod
+
+
+def stamp(ts):
+    return datetime.fromtimestamp(ts).strftime("[%m/%d/%y, %H:%M:%S:") + f"{int(ts % 1 * 1000):03d}]"
+
+
+NOISE = [
+    "info: Store: SET_UNREAD_COUNT {{\"count\":{n}}}",
+    "info: [API-Q] {n} api.test called with reason: connection-check",
+    "warn: Failed to load resource net::ERR_ABORTED {n}",
+    "info: WebappWindowManager: focus window {n}",
+    "info: Store: UPDATE_SETTINGS \n{{\n  \"teamId\": \"T0{n}\",\n  \"zoom\": 1\n}}",
+]
+
+
+def block(ts, i, rng, malformed=False):
+    payload = json.dumps({
+        "teamId": f"T{rng.randint(1, 3):08d}",
+        "channel": f"{rng.choice('CDG')}{i:010d}",
+        "msg": f"{int(ts)}.{i % 1000000:06d}",
+        "thread_ts": f"{int(ts) - 60}.000100" if rng.random() < 0.3 else "",
+        "title": "[REDACTED]",
+        "content": "[REDACTED]",
+    }, indent=2)
+    if malformed:
+        payload = payload.replace('",\n  "msg"', '"\n  "msg"')
+    return f"{stamp(ts)} info: Store: NEW_NOTIFICATION \n{payload}\n"
+
+
+def write_log(path, start, size, rng, counter):
+    """Roughly size bytes of log from start; returns (notification times, end)."""
+    out, times, written, ts = [], [], 0, start
+    while written < size:
+        ts += rng.random() * 0.4
+        if rng.random() < 0.08:
+            counter[0] += 1
+            text = block(ts, counter[0], rng, malformed=rng.random() < 0.02)
+            times.append(ts)
+        else:
+            text = f"{stamp(ts)} " + rng.choice(NOISE).format(n=rng.randint(0, 10 ** 6)) + "\n"
+        out.append(text)
+        written += len(text)
+    path.write_text("".join(out))
+    return times, ts
+
+
+def build_logs(root, size_mb, rng, checks):
+    """browser1.log (rotated, ~5MB) and browser.log (~size_mb), with the edge
+    cases appended. Returns (targets, descriptions of the edge cases)."""
+    logs = root / "logs"
+    logs.mkdir(parents=True, exist_ok=True)
+    counter = [0]
+    old, t = write_log(logs / "browser1.log", 1.79e9, 5 * 1024 * 1024, rng, counter)
+    # First block of the new log within tolerance of the rotated log's last
+    # one: the newest log must win even though the rotated one is closer.
+    boundary = t + 2.5
+    new, t = write_log(logs / "browser.log", boundary, int(size_mb * 1024 * 1024), rng, counter)
+    with (logs / "browser.log").open("a") as f:
+        # Equal distance either side of tie_target: the earlier block wins.
+        tie_target = t + 10
+        f.write(block(tie_target - 1, 900001, rng) + block(tie_target + 1, 900002, rng))
+        # Closest block malformed: the next closest must be returned.
+        bad_target = t + 20
+        f.write(block(bad_target, 900003, rng, malformed=True) + block(bad_target + 0.5, 900004, rng))
+        # Still being written at EOF: never matched.
+        f.write(block(t + 30, 900005, rng)[:80])
+    edges = {
+        "rotation boundary": old[-1] + 0.5,
+        "tie": tie_target,
+        "malformed closest": bad_target,
+        "partial block": t + 30,
+        "before everything": 1.0,
+        "newest": tie_target + 1,
+    }
+    sampled = rng.sample(new, min(len(new), checks * 3 // 4)) + rng.sample(old, min(len(old), checks // 4))
+    return sampled, edges
+
+
+def strategies(mod):
+    def index_cold(target):
+        mod._index = None
+        mod.INDEX_PATH.unlink(missing_ok=True)
+        return mod.resolve(target, TOLERANCE, mod.find_indexed)
+
+    def index_warm(target):
+        mod._index = None
+        return mod.resolve(target, TOLERANCE, mod.find_indexed)
+
+    def index_mem(target):
+        return mod.resolve(target, TOLERANCE, mod.find_indexed)
+
+    return {
+        "full": lambda target: mod.resolve(target, TOLERANCE, mod.find_full),
+        "tail": lambda target: mod.resolve(target, TOLERANCE, mod.find_tail),
+        "index-cold": index_cold,
+        "index-warm": index_warm,
+        "index-mem": index_mem,
+    }
+
+
+def measure(fn, targets):
+    times = []
+    for target in targets:
+        start = time.perf_counter()
+        fn(target)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    tracemalloc.start()
+    fn(targets[len(targets) // 2])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"median_ms": round(statistics.median(times), 3),
+            "p95_ms": round(times[int(len(times) * 0.95)], 3),
+            "peak_kib": round(peak / 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slack-notification-context.py scans.")
+    parser.add_argument("--sizes", default="0.5,2,4.9", help="browser.log sizes in MB")
+    parser.add_argument("--queries", type=int, default=40, help="timed lookups per strategy and size")
+    parser.add_argument("--checks", type=int, default=80, help="sampled targets cross-checked per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic logs and print their path")
+    args = parser.parse_args()
+
+    if HELPER is None:
+        sys.exit("slack-notification-context.py not found next to this script")
+
+    rng = random.Random(args.seed)
+    results, mismatches = {}, []
+    root = Path(tempfile.mkdtemp(prefix="slack-context-bench-"))
+    try:
+        for size in (float(s) for s in args.sizes.split(",")):
+            case = root / f"{size}mb"
+            sampled, edges = build_logs(case, size, rng, args.checks)
+            mod = load_helper(case)
+            scans = strategies(mod)
+
+            # Correctness: every strategy agrees with the reference scan.
+            checks = [(f"sampled {i}", t) for i, t in enumerate(sampled)] + list(edges.items())
+            for label, target in checks:
+                want = scans["full"](target)
+                for name, fn in scans.items():
+                    got = fn(target)
+                    if got != want:
+                        mismatches.append({"size_mb": size, "case": label, "target": target,
+                                           "strategy": name, "want": want, "got": got})
+
+            # Latency: recent targets dominate real clicks; include old ones.
+            recent = sorted(sampled, reverse=True)[:args.queries // 2]
+            timed = recent + rng.sample(sampled, args.queries - len(recent))
+            results[f"{size}mb"] = {
+                "log_bytes": (case / "logs" / "browser.log").stat().st_size,
+                "strategies": {name: measure(fn, timed) for name, fn in scans.items()},
+            }
+
+        print(json.dumps({"params": {k: v for k, v in vars(args).items() if k != "keep"},
+                          "mismatches": len(mismatches), "sizes": results}, indent=2))
+        for m in mismatches[:20]:
+            print(json.dumps(m), file=sys.stderr)
+    finally:
+        if args.keep:
+            print(f"logs kept at {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
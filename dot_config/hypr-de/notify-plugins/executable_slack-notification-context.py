@@ -17,14 +17,42 @@ so arrival-time correlation identifies the notification reliably.
 
 Usage:
   slack-notification-context.py deeplink <epoch-seconds> [tolerance-seconds]
+                                [--scan index|tail|full]
       Print "slack://channel?team=...&id=...&message=..." for the
       notification that arrived at the given time, or nothing if no
       confident match.
+
+Scan strategies (all return the same match):
+  index  (default) a sidecar index (epoch, byte offset, length per
+         NEW_NOTIFICATION block) in $XDG_CACHE_HOME/slack-notification-context/.
+         Keyed by inode, so it survives browser.log rotating to browser1.log,
+         and extended from the last indexed offset as the log grows; a lookup
+         is a binary search, one seek and one JSON parse.
+  tail   no state: read the log backward in TAIL_CHUNK pieces (mmap'd when
+         possible) and stop once lines are older than the target window.
+         Cost follows how far back the target is, not the log size.
+  full   the original whole-file regex scan; the reference for the others.
+
+  slack-notification-context.py serve
+      Stay resident: keep the index in memory, extend it as Slack writes (via
+      inotify), and answer lookups on $XDG_RUNTIME_DIR/slack-notification-context.sock.
+      deeplink (default scan) asks the daemon first and falls back to its own
+      scan when nothing is listening. Protocol: one JSON line per request,
+      {"targets": [epoch, ...], "tolerance": s}, answered with
+      {"uris": [uri or null, ...]} in the same order.
 """
 
+import bisect
 import json
+import mmap
+import os
 import re
+import selectors
+import signal
+import socket
+import struct
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
@@ -32,8 +60,18 @@ LOG_DIR = Path.home() / ".config/Slack/logs/default"
 # browser.log rotates to browser1.log at ~5MB; check both, newest first.
 LOG_FILES = ["browser.log", "browser1.log"]
 
-STAMP = r"^\[(\d{2}/\d{2}/\d{2}), (\d{2}:\d{2}:\d{2}):(\d{3})\] info: Store: "
-NEW_RE = re.compile(STAMP + r"NEW_NOTIFICATION \n(\{.*?\n\})", re.M | re.S)
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "slack-notification-context"
+INDEX_PATH = CACHE_DIR / "index.json"
+INDEX_VERSION = 1
+SOCKET_PATH = Path(os.environ.get("XDG_RUNTIME_DIR") or "/tmp") / "slack-notification-context.sock"
+CLIENT_TIMEOUT = 0.5
+SAVE_EVERY = 60.0
+
+STAMP = rb"^\[(\d{2}/\d{2}/\d{2}), (\d{2}:\d{2}:\d{2}):(\d{3})\] info: Store: "
+NEW_RE = re.compile(STAMP + rb"NEW_NOTIFICATION \n(\{.*?\n\})", re.M | re.S)
+LINE_RE = re.compile(rb"\[(\d{2}/\d{2}/\d{2}), (\d{2}:\d{2}:\d{2}):(\d{3})\]")
+
+TAIL_CHUNK = 64 * 1024
 
 
 def to_epoch(date_s, time_s, ms):
@@ -41,35 +79,226 @@ def to_epoch(date_s, time_s, ms):
     return ts.timestamp() + int(ms) / 1000.0
 
 
-def read(name):
-    path = LOG_DIR / name
+def match_epoch(m):
+    return to_epoch(m.group(1).decode(), m.group(2).decode(), m.group(3).decode())
+
+
+def read(path, start=0):
     try:
-        return path.read_text(errors="replace") if path.is_file() else ""
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read()
     except OSError:
-        return ""
+        return b""
 
 
-def cmd_deeplink(target, tolerance):
+def find_full(path, target, tolerance):
+    """Reference scan: every block in the file, closest within tolerance."""
     best = None
-    for name in LOG_FILES:
-        for m in NEW_RE.finditer(read(name)):
+    for m in NEW_RE.finditer(read(path)):
+        try:
+            epoch = match_epoch(m)
+            payload = json.loads(m.group(4))
+        except ValueError:
+            continue
+        delta = abs(epoch - target)
+        if delta <= tolerance and (best is None or delta < best[0]):
+            best = (delta, payload)
+    return best[1] if best else None
+
+
+# --- Reverse tail scan -------------------------------------------------------
+# Every log line starts with "[<stamp>]" and the pretty-printed JSON of a
+# block never has "[" at column 0, so a "\n[" is always a line boundary that
+# no block straddles. Each pass covers [first line start in the chunk, end of
+# the previous pass); the partial line in front of it is left for the next,
+# earlier chunk.
+
+def find_tail(path, target, tolerance):
+    floor = target - tolerance
+    candidates = []
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # empty, or a filesystem without mmap
+            m = None
+
+        def read_at(start, end):
+            if m is not None:
+                return m[start:end]
+            f.seek(start)
+            return f.read(end - start)
+
+        end = start = size
+        while end > 0:
+            start = max(0, start - TAIL_CHUNK)
+            data = read_at(start, end)
+            first = 0
+            if start > 0:
+                cut = data.find(b"\n[")
+                if cut < 0:  # one line longer than a chunk: widen
+                    continue
+                first = cut + 1
+            for mt in NEW_RE.finditer(data, first):
+                try:
+                    delta = abs(match_epoch(mt) - target)
+                except ValueError:
+                    continue
+                if delta <= tolerance:
+                    candidates.append((delta, start + mt.start(4), mt.group(4)))
+            line = LINE_RE.match(data, first)
+            end = start = start + first
             try:
-                epoch = to_epoch(m.group(1), m.group(2), m.group(3))
-                payload = json.loads(m.group(4))
-            except (ValueError, json.JSONDecodeError):
-                continue
-            delta = abs(epoch - target)
-            if delta <= tolerance and (best is None or delta < best[0]):
-                best = (delta, payload)
-        if best:  # newest log had a match; skip the rotated one
-            break
-    if not best:
-        return
-    payload = best[1]
+                if line and match_epoch(line) < floor:
+                    break
+            except ValueError:
+                pass
+        if m is not None:
+            m.close()
+    for _delta, _offset, raw in sorted(candidates, key=lambda c: (c[0], c[1])):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            continue
+    return None
+
+
+# --- Sidecar index -----------------------------------------------------------
+# {"version": 1, "logs": {"<dev>:<ino>": {"offset": n, "entries": [[epoch,
+# json offset, json length], ...]}}}, entries sorted by epoch. "offset" is
+# where indexing resumes (see index_blocks). A file smaller than its offset
+# was truncated and is reindexed from scratch.
+
+def load_index():
+    try:
+        index = json.loads(INDEX_PATH.read_text())
+    except (OSError, ValueError):
+        return {"version": INDEX_VERSION, "logs": {}}
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return {"version": INDEX_VERSION, "logs": {}}
+    return index
+
+
+def save_index(index):
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = INDEX_PATH.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(index, separators=(",", ":")))
+        tmp.replace(INDEX_PATH)
+    except OSError:
+        pass
+
+
+def index_blocks(data, base):
+    """(epoch, offset, length) of every complete block in data, which starts
+    at file offset base, and the offset to resume from: past the last block,
+    or at the last log line if that came later (it may be mid-write)."""
+    entries = []
+    resume = base
+    for m in NEW_RE.finditer(data):
+        resume = base + m.end()
+        try:
+            epoch = match_epoch(m)
+        except ValueError:
+            continue
+        entries.append([epoch, base + m.start(4), m.end(4) - m.start(4)])
+    cut = data.rfind(b"\n[")
+    return entries, max(resume, base + cut + 1 if cut >= 0 else base)
+
+
+def log_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return f"{st.st_dev}:{st.st_ino}", st.st_size
+
+
+def refresh_index(index):
+    """Extend the index to the current end of every log file and drop logs
+    that rotated away. Returns True if anything changed."""
+    dirty = False
+    live = set()
+    for name in LOG_FILES:
+        path = LOG_DIR / name
+        key, size = log_key(path)
+        if key is None:
+            continue
+        live.add(key)
+        log = index["logs"].get(key)
+        if log is None or size < log["offset"]:
+            log = index["logs"][key] = {"offset": 0, "entries": []}
+            dirty = True
+        if size > log["offset"]:
+            entries, resume = index_blocks(read(path, log["offset"]), log["offset"])
+            if entries:
+                log["entries"].extend(entries)
+                log["entries"].sort(key=lambda e: e[0])
+            dirty = dirty or resume != log["offset"]
+            log["offset"] = resume
+    for key in set(index["logs"]) - live:
+        del index["logs"][key]
+        dirty = True
+    return dirty
+
+
+_index = None
+_index_dirty = False  # serve: changed since last saved
+
+
+def indexed_entries(path):
+    global _index
+    if _index is None:
+        _index = load_index()
+        if refresh_index(_index):
+            save_index(_index)
+    key, _size = log_key(path)
+    log = _index["logs"].get(key)
+    return log["entries"] if log else []
+
+
+def search_entries(path, entries, target, tolerance):
+    """Closest parseable block within tolerance among sorted entries;
+    equal distances keep file order, like find_full."""
+    lo = bisect.bisect_left(entries, target - tolerance, key=lambda e: e[0])
+    hi = bisect.bisect_right(entries, target + tolerance, key=lambda e: e[0])
+    if lo == hi:
+        return None
+    try:
+        with open(path, "rb") as f:
+            for _epoch, offset, length in sorted(entries[lo:hi], key=lambda e: (abs(e[0] - target), e[1])):
+                f.seek(offset)
+                try:
+                    return json.loads(f.read(length))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return None
+
+
+def find_indexed(path, target, tolerance):
+    return search_entries(path, indexed_entries(path), target, tolerance)
+
+
+def best_payload(target, tolerance, find=find_indexed):
+    for name in LOG_FILES:
+        payload = find(LOG_DIR / name, target, tolerance)
+        if payload is not None:  # newest log had a match; skip the rotated one
+            return payload
+    return None
+
+
+def deeplink_uri(payload):
     team = payload.get("teamId") or ""
     channel = payload.get("channel") or ""
     if not (team.startswith("T") and channel and channel[0] in "CDG"):
-        return
+        return None
     uri = f"slack://channel?team={team}&id={channel}"
     # Message-precise navigation: the webapp scrolls to and highlights the
     # message; thread_ts additionally opens the thread pane (same params
@@ -80,14 +309,242 @@ def cmd_deeplink(target, tolerance):
     thread = payload.get("thread_ts") or ""
     if re.fullmatch(r"\d+\.\d+", thread):
         uri += f"&thread_ts={thread}"
-    print(uri)
+    return uri
+
+
+SCANS = {"index": find_indexed, "tail": find_tail, "full": find_full}
+
+
+def resolve(target, tolerance, find=find_indexed):
+    payload = best_payload(target, tolerance, find)
+    return deeplink_uri(payload) if isinstance(payload, dict) else None
+
+
+# --- Daemon ------------------------------------------------------------------
+
+IN_MODIFY = 0x2
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_EVENT = struct.Struct("iIII")
+
+
+def inotify_watch(path):
+    """Non-blocking inotify fd watching path, or None (then the index is only
+    refreshed per query, which is still correct, just on the click path)."""
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, str(path).encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def drain_inotify(fd):
+    """Whether any event since the last drain concerns a log file."""
+    names = {n.encode() for n in LOG_FILES}
+    hit = False
+    while True:
+        try:
+            buf = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return hit
+        off = 0
+        while off + IN_EVENT.size <= len(buf):
+            length = IN_EVENT.unpack_from(buf, off)[3]
+            name = buf[off + IN_EVENT.size:off + IN_EVENT.size + length].rstrip(b"\0")
+            off += IN_EVENT.size + length
+            hit = hit or name in names
+
+
+def answer(request):
+    global _index_dirty
+    req = json.loads(request)
+    tolerance = float(req.get("tolerance", 6.0))
+    if refresh_index(_index):
+        _index_dirty = True
+    return {"uris": [resolve(float(t), tolerance) for t in req.get("targets", [])]}
+
+
+class Client:
+    """One connection, read without blocking from the serve loop so a slow
+    client only holds up itself, until its deadline."""
+
+    def __init__(self, conn):
+        conn.setblocking(False)
+        self.conn = conn
+        self.buf = b""
+        self.deadline = time.monotonic() + CLIENT_TIMEOUT
+
+    def readable(self):
+        """Read what's there; True once the request is complete (or the
+        client closed, or failed) and the connection is done."""
+        try:
+            chunk = self.conn.recv(4096)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        self.buf += chunk
+        if chunk and not self.buf.endswith(b"\n"):
+            return False
+        try:
+            reply = answer(self.buf)
+        except (ValueError, TypeError, AttributeError) as e:
+            reply = {"error": str(e)}
+        try:
+            # A reply fits the socket buffer; one that doesn't is dropped
+            # rather than waited on.
+            self.conn.send(json.dumps(reply).encode() + b"\n")
+        except OSError:
+            pass
+        return True
+
+
+def listen():
+    SOCKET_PATH.parent.mkdir(parents=True, exist_ok=True)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(SOCKET_PATH))
+        sys.exit(f"already serving on {SOCKET_PATH}")
+    except OSError:
+        pass
+    finally:
+        probe.close()
+    try:
+        SOCKET_PATH.unlink()
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(str(SOCKET_PATH))
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    return server
+
+
+def cmd_serve():
+    global _index, _index_dirty
+    _index = load_index()
+    refresh_index(_index)
+    save_index(_index)
+    server = listen()
+    server.setblocking(False)
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ, "accept")
+    watch = inotify_watch(LOG_DIR)
+    if watch is not None:
+        sel.register(watch, selectors.EVENT_READ, "logs")
+    clients = {}
+    stop = []
+    # select() is retried after a signal handler returns; the wakeup fd makes
+    # it return instead, so SIGTERM stops the loop at once.
+    wakeup, wakeup_w = socket.socketpair()
+    wakeup.setblocking(False)
+    wakeup_w.setblocking(False)
+    signal.set_wakeup_fd(wakeup_w.fileno())
+    sel.register(wakeup, selectors.EVENT_READ, "signal")
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+    saved_at = time.monotonic()
+
+    def close(client):
+        sel.unregister(client.conn)
+        del clients[client.conn]
+        client.conn.close()
+
+    try:
+        while not stop:
+            now = time.monotonic()
+            timeout = min([SAVE_EVERY] + [c.deadline - now for c in clients.values()])
+            for key, _events in sel.select(timeout=max(timeout, 0)):
+                if key.data == "accept":
+                    try:
+                        conn, _addr = server.accept()
+                    except OSError:
+                        continue
+                    clients[conn] = Client(conn)
+                    sel.register(conn, selectors.EVENT_READ, clients[conn])
+                elif key.data == "signal":
+                    try:
+                        wakeup.recv(64)
+                    except BlockingIOError:
+                        pass
+                elif key.data == "logs":
+                    if drain_inotify(watch) and refresh_index(_index):
+                        _index_dirty = True
+                elif key.data.readable():
+                    close(key.data)
+            now = time.monotonic()
+            for client in [c for c in clients.values() if c.deadline <= now]:
+                close(client)
+            if _index_dirty and now - saved_at >= SAVE_EVERY:
+                # Keeps the one-shot fallback's index warm too.
+                _index_dirty = False
+                save_index(_index)
+                saved_at = now
+    finally:
+        signal.set_wakeup_fd(-1)
+        for client in list(clients.values()):
+            close(client)
+        server.close()
+        try:
+            SOCKET_PATH.unlink()
+        except FileNotFoundError:
+            pass
+        save_index(_index)
+
+
+def query_daemon(targets, tolerance):
+    """URIs for targets from a running daemon, or None if there isn't one."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(str(SOCKET_PATH))
+            sock.sendall(json.dumps({"targets": targets, "tolerance": tolerance}).encode() + b"\n")
+            buf = b""
+            while not buf.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+        uris = json.loads(buf)["uris"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return uris if isinstance(uris, list) and len(uris) == len(targets) else None
+
+
+def cmd_deeplink(target, tolerance, scan="index"):
+    uris = query_daemon([target], tolerance) if scan == "index" else None
+    uri = uris[0] if uris is not None else resolve(target, tolerance, SCANS[scan])
+    if uri:
+        print(uri)
 
 
 def main():
-    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
-    if cmd == "deeplink" and len(sys.argv) > 2:
-        cmd_deeplink(float(sys.argv[2]),
-                     float(sys.argv[3]) if len(sys.argv) > 3 else 6.0)
+    args = sys.argv[1:]
+    scan = "index"
+    if "--scan" in args:
+        i = args.index("--scan")
+        scan = args[i + 1] if i + 1 < len(args) else ""
+        del args[i:i + 2]
+    cmd = args[0] if args else ""
+    if cmd == "deeplink" and len(args) > 1 and scan in SCANS:
+        cmd_deeplink(float(args[1]),
+                     float(args[2]) if len(args) > 2 else 6.0, scan)
+    elif cmd == "serve":
+        cmd_serve()
     else:
         sys.exit(__doc__ and 2)
 
@@ -0,0 +1,742 @@
+# Header state shared by tab_bar.py (drawing) and watcher.py (push events).
+# The terminal-header daemon (~/scripts/terminal-header/) writes
+# $XDG_RUNTIME_DIR/terminal-header/pane-<key>.json as
+# {"header": string|null, "updatedAtMs": ms}; this module indexes those
+# files, tracks tabs, and flips the bar's visibility. Pane key is
+# kitty-<kitty pid>-<window id> (the pid disambiguates instances: Hyprland
+# runs one kitty per OS window, so window ids alone collide).
+#
+# The only policy kept in-process is the visibility flip itself, which must
+# run inside kitty: tab_bar_min_tabs drives the C layout, and the
+# on_set_user_var watcher (pushed by the daemon on every header change, plus
+# agent hooks) flips it between 1 and 9999, with a backing-off timer as the
+# fallback.
+#
+# kitty runs tab_bar.py and watcher.py with runpy, so neither is a real
+# module that could import the other; both load this file under one
+# sys.modules name instead, so there is exactly one cache, one timer and one
+# set of counters per kitty process.
+
+import json
+import mmap
+import os
+import struct
+import time
+import weakref
+
+from kitty.boss import get_boss
+from kitty.constants import is_wayland
+from kitty.fast_data_types import add_timer, get_options, set_options
+
+HEADER_TTL_MS = 60 * 1000
+
+
+def _runtime_root(name: str) -> str:
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(os.environ.get('HOME', '.'), '.cache')
+    return os.path.join(base, name)
+
+
+# Header index: window id -> (header, updatedAtMs) for every pane file of this
+# kitty instance that currently has a header; a window with no entry has
+# none. It is a complete view of the directory, kept current by an inotify
+# watch (the daemon writes via rename, so IN_MOVED_TO covers updates — only
+# the changed file is re-read) or, without inotify, by rescanning when the
+# directory's mtime moves (a rename into it always bumps that). TTL is
+# evaluated on every lookup, so expiry needs no I/O either.
+_cache: dict[int, tuple[str, float | None]] = {}
+_inotify_fd: int | None = None
+_dir_mtime: int | None = None
+
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_EVENT = struct.Struct('iIII')
+
+
+def _header_dir() -> str:
+    return _runtime_root('terminal-header')
+
+
+_libc = None
+
+
+def _inotify_watch(path: str) -> int | None:
+    global _libc
+    if _libc is False:
+        return None
+    try:
+        if _libc is None:
+            import ctypes
+            import ctypes.util
+            _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            _libc = False
+            return None
+        mask = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                | _IN_DELETE_SELF | _IN_MOVE_SELF)
+        if _libc.inotify_add_watch(fd, path.encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception:
+        _libc = False
+        return None
+
+
+def _drop_watch() -> None:
+    global _inotify_fd, _dir_mtime
+    if _inotify_fd is not None:
+        try:
+            os.close(_inotify_fd)
+        except OSError:
+            pass
+        _inotify_fd = None
+        _dir_mtime = None
+
+
+def _window_for_name(name: bytes) -> int | None:
+    prefix = f'pane-kitty-{os.getpid()}-'.encode()
+    if not (name.startswith(prefix) and name.endswith(b'.json')):
+        return None
+    try:
+        return int(name[len(prefix):-len(b'.json')])
+    except ValueError:
+        return None
+
+
+def _drain_inotify() -> None:
+    while _inotify_fd is not None:
+        try:
+            buf = os.read(_inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        except OSError:
+            _drop_watch()
+            return
+        off = 0
+        while off + _IN_EVENT.size <= len(buf):
+            _wd, mask, _cookie, length = _IN_EVENT.unpack_from(buf, off)
+            name = buf[off + _IN_EVENT.size:off + _IN_EVENT.size + length].rstrip(b'\0')
+            off += _IN_EVENT.size + length
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                # Lost the directory; _sync() falls back to stat + rescan.
+                _drop_watch()
+                return
+            if mask & _IN_Q_OVERFLOW:
+                _rescan()
+                continue
+            window_id = _window_for_name(name)
+            if window_id is not None:
+                _reload(window_id)
+
+
+# Shared channel (the daemon's channel.ts documents the layout): when
+# headers.bin exists, the index is rebuilt from it whenever its generation
+# counter moves, and an unchanged generation costs one 8-byte read — no
+# inotify watch, no stat, no JSON. Without it (old daemon, more panes than
+# it holds, a bad file) everything below falls back to the JSON files.
+_CHANNEL_MAGIC = b'THC1'
+_CHANNEL_HEAD = struct.Struct('<4sIQIII')
+_CHANNEL_RECORDS_AT = 32
+_CHANNEL_GENERATION = struct.Struct('<Q')
+_CHANNEL_RECORD = struct.Struct('<HHId')
+_CHANNEL_RECORD_SIZE = 512
+_CHANNEL_KEY_MAX = 96
+_CHANNEL_HEADER_AT = 16 + _CHANNEL_KEY_MAX
+_CHANNEL_HEADER_MAX = _CHANNEL_RECORD_SIZE - _CHANNEL_HEADER_AT
+_CHANNEL_TRUNCATED = 1
+_CHANNEL_HEADER_IN_JSON = 0xFFFF
+_CHANNEL_PROBE_S = 5.0
+_channel: mmap.mmap | None = None
+_channel_ino: int | None = None
+_channel_gen: int | None = None
+_channel_probed_at = 0.0
+
+
+def _channel_path() -> str:
+    return os.path.join(_header_dir(), 'headers.bin')
+
+
+def _open_channel() -> None:
+    global _channel, _channel_ino, _channel_gen, _channel_probed_at, _dir_mtime
+    _channel_probed_at = time.monotonic()
+    try:
+        fd = os.open(_channel_path(), os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        return
+    try:
+        st = os.fstat(fd)
+        if st.st_size < _CHANNEL_RECORDS_AT:
+            return
+        m = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return
+    finally:
+        os.close(fd)
+    magic, record_size, _gen, _count, capacity, flags = _CHANNEL_HEAD.unpack_from(m)
+    # Every record the head claims must be inside the mapping, or reads
+    # would run off its end.
+    if (magic != _CHANNEL_MAGIC or record_size != _CHANNEL_RECORD_SIZE
+            or st.st_size < _CHANNEL_RECORDS_AT + capacity * _CHANNEL_RECORD_SIZE
+            or flags & _CHANNEL_TRUNCATED):
+        m.close()
+        return
+    _channel, _channel_ino, _channel_gen = m, st.st_ino, None
+    # The channel replaces the directory watch while it is healthy.
+    _drop_watch()
+    _dir_mtime = None
+    _dbg(f'channel mapped: {_channel_path()}')
+
+
+def _close_channel() -> None:
+    global _channel, _channel_ino, _dir_mtime
+    if _channel is not None:
+        _channel.close()
+        _channel = _channel_ino = None
+        _dir_mtime = None  # JSON path rescans and re-watches
+        count('channel_fallbacks')
+        _dbg('channel dropped; falling back to JSON files')
+
+
+def _check_channel_file() -> None:
+    # From the push path and the fallback timer: notice the daemon recreating
+    # (or removing) headers.bin, which the mapping alone can't see, and remap
+    # the new file straight away. One stat.
+    if _channel is None:
+        return
+    try:
+        ino = os.stat(_channel_path()).st_ino
+    except OSError:
+        ino = None
+    if ino != _channel_ino:
+        _close_channel()
+        if ino is not None:
+            _open_channel()
+
+
+def _read_channel() -> bool:
+    # False when the channel can't be trusted right now (mid-write on every
+    # retry, or truncated); the caller then uses the JSON files.
+    global _channel_gen
+    m = _channel
+    prefix = f'kitty-{os.getpid()}-'.encode()
+    for _ in range(4):
+        gen = _CHANNEL_GENERATION.unpack_from(m, 8)[0]
+        if gen == _channel_gen:
+            return True
+        if gen & 1:
+            continue
+        _magic, _size, _gen, count_, capacity, flags = _CHANNEL_HEAD.unpack_from(m)
+        if flags & _CHANNEL_TRUNCATED:
+            return False
+        # Copy everything out before re-checking the generation: bytes read
+        # after the check could belong to a write that started since.
+        entries = []
+        mapped = (len(m) - _CHANNEL_RECORDS_AT) // _CHANNEL_RECORD_SIZE
+        for i in range(min(count_, capacity, mapped)):
+            at = _CHANNEL_RECORDS_AT + i * _CHANNEL_RECORD_SIZE
+            key_len, header_len, _reserved, updated = _CHANNEL_RECORD.unpack_from(m, at)
+            key = m[at + 16:at + 16 + min(key_len, _CHANNEL_KEY_MAX)]
+            if not key.startswith(prefix):
+                continue
+            try:
+                window_id = int(key[len(prefix):])
+            except ValueError:
+                continue
+            header = b''
+            if header_len != _CHANNEL_HEADER_IN_JSON:
+                header_len = min(header_len, _CHANNEL_HEADER_MAX)
+                header = m[at + _CHANNEL_HEADER_AT:at + _CHANNEL_HEADER_AT + header_len]
+            entries.append((window_id, header_len, header, updated))
+        if _CHANNEL_GENERATION.unpack_from(m, 8)[0] != gen:
+            continue
+        seen = set()
+        for window_id, header_len, header, updated in entries:
+            seen.add(window_id)
+            if header_len == _CHANNEL_HEADER_IN_JSON:
+                _set(window_id, *_load(window_id))
+            elif header_len:
+                _set(window_id, header.decode('utf-8', 'replace'), updated)
+            else:
+                _set(window_id, None, None)
+        for window_id in set(_cache) - seen:
+            _set(window_id, None, None)
+        _channel_gen = gen
+        count('channel_reads')
+        return True
+    return False
+
+
+def _sync() -> None:
+    # Bring the index up to date with the daemon's output: the channel when
+    # there is one, else the header directory. With inotify that is one
+    # non-blocking read plus a read of each changed file; otherwise one stat
+    # of the directory. The watch is (re)installed whenever the directory
+    # appears or changes without one.
+    global _inotify_fd, _dir_mtime
+    if _channel is None and time.monotonic() - _channel_probed_at >= _CHANNEL_PROBE_S:
+        _open_channel()
+    if _channel is not None:
+        if _read_channel():
+            return
+        _close_channel()
+    if _inotify_fd is not None:
+        _drain_inotify()
+        if _inotify_fd is not None:
+            return
+    try:
+        mtime = os.stat(_header_dir()).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime != _dir_mtime:
+        _dir_mtime = mtime
+        if mtime is not None:
+            _inotify_fd = _inotify_watch(_header_dir())
+            if _inotify_fd is not None:
+                _dbg(f'inotify watch on {_header_dir()}')
+        # Rescan after the watch exists so nothing falls between the two.
+        _rescan()
+
+
+def _load(window_id: int) -> tuple[str | None, float | None]:
+    path = os.path.join(_header_dir(), f'pane-kitty-{os.getpid()}-{window_id}.json')
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except OSError as e:
+        _dbg(f'header miss {path}: {e.__class__.__name__}')
+        return None, None
+    except ValueError:
+        count('parse_errors')
+        return None, None
+    finally:
+        count('file_reads')
+    if not isinstance(state, dict):
+        count('parse_errors')
+        return None, None
+    header = state.get('header')
+    updated = state.get('updatedAtMs')
+    return (header if isinstance(header, str) and header else None,
+            updated if isinstance(updated, (int, float)) else None)
+
+
+def _reload(window_id: int) -> None:
+    # Re-read one pane file.
+    _set(window_id, *_load(window_id))
+
+
+def _set(window_id: int, header: str | None, updated: float | None) -> None:
+    # Only a change in header text counts as a change; the daemon's periodic
+    # restamps just refresh updatedAtMs.
+    global _changes
+    old = _cache.get(window_id)
+    if header is None:
+        _cache.pop(window_id, None)
+    else:
+        _cache[window_id] = (header, updated)
+    if (old[0] if old else None) != header:
+        _changes += 1
+
+
+def _rescan() -> None:
+    prefix = f'pane-kitty-{os.getpid()}-'
+    try:
+        names = os.listdir(_header_dir())
+    except OSError:
+        names = []
+    present = {_window_for_name(n.encode()) for n in names if n.startswith(prefix)} - {None}
+    for window_id in set(_cache) - present:
+        _reload(window_id)
+    for window_id in present:
+        _reload(window_id)
+
+
+def _header_for(window_id: int) -> str | None:
+    # Callers run _sync() first; this does no I/O.
+    entry = _cache.get(window_id)
+    if entry is None:
+        count('header_misses')
+        return None
+    header, updated = entry
+    if updated is None or (time.time() * 1000) - updated > HEADER_TTL_MS:
+        count('header_stale')
+        _dbg(f'header stale window={window_id}')
+        return None
+    count('header_hits')
+    return header
+
+
+# tab id -> Tab (weakly held), for draw_tab's lookup. Maintained from
+# watcher.py's focus/close hooks; a miss rebuilds it with one walk.
+_tabs: dict[int, weakref.ref] = {}
+
+
+def index_tab(tab) -> None:
+    _tabs[tab.id] = weakref.ref(tab)
+
+
+def forget_closed_tabs() -> None:
+    for tab_id in [t for t, ref in _tabs.items() if ref() is None]:
+        del _tabs[tab_id]
+
+
+def _rebuild_tab_index(boss) -> None:
+    _tabs.clear()
+    for tm in boss.os_window_map.values():
+        for tab in tm:
+            index_tab(tab)
+    _dbg(f'tab index rebuilt ({len(_tabs)} tabs)')
+
+
+def _content_present(boss) -> bool:
+    # Only windows that have a header can make the bar visible, so walk the
+    # header index (not every tab) and check each is its tab's active window.
+    _sync()
+    for window_id in _cache:
+        if not _header_for(window_id):
+            continue
+        w = boss.window_id_map.get(window_id)
+        tab = w.tabref() if w is not None else None
+        if tab is not None and tab.active_window is w:
+            return True
+    return False
+
+
+_DEBUG = os.environ.get('KITTY_HEADER_DEBUG') == '1'
+
+
+def _dbg(msg: str) -> None:
+    if _DEBUG:
+        import sys
+        print(f'[header] {msg}', file=sys.stderr, flush=True)
+
+
+# Always-on stats: plain counters plus log2 latency histograms (bucket i
+# holds durations under 2**i µs), dumped to
+# $XDG_RUNTIME_DIR/terminal-header/stats/kitty-<pid>.json from the fallback
+# timer at most every _STATS_EVERY_S, or at once on request (watcher.py's
+# terminal_header_stats user var). A subdirectory, so the dumps don't bump
+# the header directory's mtime or wake its inotify watch.
+_STATS_EVERY_S = 10.0
+_HIST_BUCKETS = 24
+_counters: dict[str, int] = {}
+_hists: dict[str, list[int]] = {}
+_stats_dumped_at = 0.0
+_stats_dirty = False
+
+
+def count(name: str, n: int = 1) -> None:
+    global _stats_dirty
+    _counters[name] = _counters.get(name, 0) + n
+    _stats_dirty = True
+
+
+def record(name: str, start_ns: int) -> None:
+    # Add one duration, measured from a time.perf_counter_ns() start.
+    global _stats_dirty
+    elapsed_ns = time.perf_counter_ns() - start_ns
+    hist = _hists.get(name)
+    if hist is None:
+        # [count, total ns, max ns, *buckets]
+        hist = _hists[name] = [0, 0, 0] + [0] * _HIST_BUCKETS
+    hist[0] += 1
+    hist[1] += elapsed_ns
+    hist[2] = max(hist[2], elapsed_ns)
+    hist[3 + min((elapsed_ns // 1000).bit_length(), _HIST_BUCKETS - 1)] += 1
+    _stats_dirty = True
+
+
+def stats() -> dict:
+    return {
+        'pid': os.getpid(),
+        'atMs': int(time.time() * 1000),
+        'counters': dict(sorted(_counters.items())),
+        'events': {'received': events_received, 'evaluations': evaluations,
+                   'light_evaluations': light_evaluations},
+        'cached_headers': len(_cache),
+        'indexed_tabs': len(_tabs),
+        'inotify': _inotify_fd is not None,
+        'channel': _channel is not None,
+        'latency': {
+            name: {'count': h[0],
+                   'mean_us': round(h[1] / h[0] / 1000, 1) if h[0] else 0,
+                   'max_us': round(h[2] / 1000, 1),
+                   'buckets_us': {f'<{2 ** i}': n for i, n in enumerate(h[3:]) if n}}
+            for name, h in sorted(_hists.items())
+        },
+    }
+
+
+def dump_stats(force: bool = False) -> None:
+    global _stats_dumped_at, _stats_dirty
+    now = time.monotonic()
+    if not force and (not _stats_dirty or now - _stats_dumped_at < _STATS_EVERY_S):
+        return
+    _stats_dumped_at = now
+    _stats_dirty = False
+    root = os.path.join(_header_dir(), 'stats')
+    path = os.path.join(root, f'kitty-{os.getpid()}.json')
+    try:
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(stats(), f)
+        os.replace(f'{path}.tmp', path)
+    except OSError as e:
+        _dbg(f'stats dump failed: {e}')
+
+
+# Hysteresis: the bar shows as soon as a header appears but hides only once
+# nothing has been shown for _HIDE_HOLD_S, so a header that clears and comes
+# straight back (agent state flapping, or a TTL expiry just ahead of a late
+# restamp) costs no relayout at all instead of two.
+_HIDE_HOLD_S = 3.0
+_absent_since: float | None = None
+_hold_timer_id = None
+
+# Per OS window: the header its bar was last marked dirty for, so a check
+# that changes nothing for an OS window doesn't redraw its bar.
+_drawn: dict[int, str | None] = {}
+
+
+def _hold_expired(timer_id=None) -> None:
+    global _hold_timer_id
+    _hold_timer_id = None
+    check_visibility()
+
+
+def _want_min_tabs(present: bool, current: int) -> int:
+    global _absent_since, _hold_timer_id
+    if present:
+        _absent_since = None
+        return 1
+    now = time.monotonic()
+    if _absent_since is None:
+        _absent_since = now
+    held = now - _absent_since
+    if current == 1 and held < _HIDE_HOLD_S:
+        if _hold_timer_id is None:
+            _hold_timer_id = add_timer(_hold_expired, _HIDE_HOLD_S - held + 0.05, False)
+        return 1
+    return 9999
+
+
+def _relayout(tm) -> None:
+    legacy_relayout = getattr(tm, 'tabbar_visibility_changed', None)
+    if legacy_relayout is not None:
+        # kitty < 0.47
+        legacy_relayout()
+    else:
+        # kitty >= 0.47: full resize — layout_tab_bar() plus a relayout of
+        # every tab. resize(only_tabs=True) sometimes left window content
+        # occupying the bar's row (content drawing over the header) because
+        # the central geometry wasn't recomputed for all windows.
+        tm.resize()
+
+
+def check_visibility() -> None:
+    # Hide the bar when the header is empty. tab_bar_min_tabs drives the C
+    # layout, so mutate the live Options and push it with the same call the
+    # config-reload path uses (apply_new_options in boss.py). The option is
+    # global, so a flip relays out every OS window; redraws are per OS window
+    # and only where its header changed.
+    start = time.perf_counter_ns()
+    boss = get_boss()
+    opts = get_options()
+    before = opts.tab_bar_min_tabs
+    want = _want_min_tabs(_content_present(boss), before)
+    _dbg(f'check: min_tabs={before} want={want}')
+    for os_window_id in set(_drawn) - set(boss.os_window_map):
+        del _drawn[os_window_id]
+    if before != want:
+        opts.tab_bar_min_tabs = want
+        set_options(opts, is_wayland(), boss.args.debug_rendering, boss.args.debug_font_fallback)
+        count('visibility_flips')
+        _dbg('visibility flipped')
+        for tm in boss.os_window_map.values():
+            _relayout(tm)
+            count('relayouts')
+    for os_window_id, tm in boss.os_window_map.items():
+        if len(tm) < want:
+            _drawn.pop(os_window_id, None)
+            continue
+        tab = tm.active_tab
+        window = tab.active_window if tab is not None else None
+        header = _header_for(window.id) if window is not None else None
+        if os_window_id not in _drawn or _drawn[os_window_id] != header:
+            _drawn[os_window_id] = header
+            tm.mark_tab_bar_dirty()
+    record('check_visibility', start)
+
+
+# Fallback poll. Header changes are pushed: the daemon sets the
+# terminal_header user var over the remote-control socket, which lands in
+# watcher.py's on_set_user_var → check_visibility. So the timer only has to
+# catch TTL expiry and missed pushes: it is one-shot, rescheduled from 2s
+# doubling to 30s while nothing changes, and never later than the next
+# visible header's expiry.
+_FALLBACK_MIN_S = 2.0
+_FALLBACK_MAX_S = 30.0
+_interval = _FALLBACK_MIN_S
+_timer_id = None
+_changes = 0  # header text changes seen by _sync(), ever
+
+
+def _next_expiry_s() -> float | None:
+    now_ms = time.time() * 1000
+    remaining = [(updated + HEADER_TTL_MS - now_ms) / 1000
+                 for header, updated in _cache.values()
+                 if header is not None and updated is not None and updated + HEADER_TTL_MS > now_ms]
+    return min(remaining, default=None)
+
+
+def _tick(timer_id=None) -> None:
+    global _timer_id, _interval, _stats_dirty
+    _timer_id = None
+    was_dirty = _stats_dirty
+    count('fallback_ticks')
+    _check_channel_file()
+    before = _changes
+    try:
+        check_visibility()
+    finally:
+        if _changes != before:
+            _interval = _FALLBACK_MIN_S
+        else:
+            _interval = min(_interval * 2, _FALLBACK_MAX_S)
+            # An idle tick's own bookkeeping (its count and timing) isn't a
+            # change worth a dump; it rides along with the next real one.
+            _stats_dirty = was_dirty
+        _ensure_timer()
+        dump_stats()
+
+
+def _ensure_timer() -> None:
+    global _timer_id
+    if _timer_id is None:
+        delay = _interval
+        expiry = _next_expiry_s()
+        if expiry is not None:
+            delay = max(min(delay, expiry + 0.05), 0.1)
+        _timer_id = add_timer(_tick, delay, False)
+        _dbg(f'timer scheduled id={_timer_id} in {delay:.1f}s')
+
+
+def pending_changes() -> int:
+    # Drain queued header updates; returns the running count of header
+    # changes so callers can tell whether anything moved since they last looked.
+    # A push can follow the daemon replacing headers.bin, so check that first.
+    _check_channel_file()
+    _sync()
+    return _changes
+
+
+def notify() -> None:
+    # Push path (watcher.py): evaluate now and drop the fallback back to its
+    # fast interval for the next tick.
+    global _interval
+    _interval = _FALLBACK_MIN_S
+    check_visibility()
+
+
+def ensure_timer() -> None:
+    _ensure_timer()
+
+
+def header_for(window_id: int) -> str | None:
+    _sync()
+    return _header_for(window_id)
+
+
+def tab_window(tab_id: int):
+    ref = _tabs.get(tab_id)
+    tab = ref() if ref is not None else None
+    if tab is None:
+        _rebuild_tab_index(get_boss())
+        ref = _tabs.get(tab_id)
+        tab = ref() if ref is not None else None
+    return tab.active_window if tab is not None else None
+
+
+# --- Push events (watcher.py) ------------------------------------------------
+# Hooks set several vars back to back, so events are coalesced: everything
+# within _COALESCE_S lands in one deferred evaluation on kitty's timer. That
+# evaluation only runs the full visibility check when a header actually
+# changed (or focus moved); otherwise it just redraws the affected tab bars.
+
+_COALESCE_S = 0.05
+_pending: set[int] = set()
+_pending_full = False
+_flush_timer_id = None
+_seen_changes = -1
+
+# Counters, for measuring what the coalescing saves.
+events_received = 0
+evaluations = 0        # full check_visibility runs
+light_evaluations = 0  # flushes that only redrew the affected tab bars
+
+
+def _flush(timer_id=None) -> None:
+    global _flush_timer_id, _pending_full, _seen_changes, evaluations, light_evaluations
+    _flush_timer_id = None
+    window_ids = list(_pending)
+    full = _pending_full
+    _pending.clear()
+    _pending_full = False
+    changes = pending_changes()
+    if full or changes != _seen_changes:
+        _seen_changes = changes
+        evaluations += 1
+        notify()
+    else:
+        light_evaluations += 1
+        boss = get_boss()
+        for window_id in window_ids:
+            window = boss.window_id_map.get(window_id)
+            tab = window.tabref() if window is not None else None
+            if tab is not None:
+                tab.mark_tab_bar_dirty()
+
+
+def _schedule(window, full: bool = False) -> None:
+    global _flush_timer_id, _pending_full
+    _pending.add(window.id)
+    _pending_full = _pending_full or full
+    if _flush_timer_id is None:
+        _flush_timer_id = add_timer(_flush, _COALESCE_S, False)
+
+
+def user_var_changed(window) -> None:
+    global events_received
+    events_received += 1
+    _schedule(window)
+
+
+def focus_changed(window) -> None:
+    # Keeps the tab index current (new tabs get focus on creation), and a
+    # newly active window may bring or drop a header.
+    tab = window.tabref()
+    if tab is not None:
+        index_tab(tab)
+    _schedule(window, full=True)
+
+
+def window_closed(window) -> None:
+    _pending.discard(window.id)
+    forget_closed_tabs()
+
+
+# The bar starts hidden (tab_bar_min_tabs 9999 in kitty.conf), so draw_tab —
+# the usual timer bootstrap — may never run. tab_bar.py loads this module
+# during TabBar creation at startup, so install the timer here; guarded in
+# case a future kitty constructs TabBar before its event loop exists.
+try:
+    _ensure_timer()
+except Exception:
+    pass
@@ -1,27 +1,97 @@
 # Smart paste kitten — parity with the wezterm Ctrl+V action_callback:
 # runs wezterm-paste-image, which returns a temp-file path for image
 # clipboard contents or the plain text otherwise, and pastes the result.
+#
+# The helper runs off kitty's main thread (a slow clipboard owner or a big
+# image conversion would otherwise freeze every window): a worker thread
+# waits on it, and a short main-thread timer polls for the result and pastes
+# it — kitty's objects are only touched from the main thread. If the target
+# window closes first, the helper is killed and nothing is pasted.
+# KITTY_PASTE_DEBUG=1 logs each paste's latency to kitty's stderr.
 
+import os
+import signal
 import subprocess
+import threading
+import time
 
 from kittens.tui.handler import result_handler
+from kitty.fast_data_types import add_timer
+
+HELPER = '/home/mason/scripts/wezterm-paste-image'
+TIMEOUT_S = 10
+POLL_S = 0.02
+
+_DEBUG = os.environ.get('KITTY_PASTE_DEBUG') == '1'
+
+
+def _dbg(msg: str) -> None:
+    if _DEBUG:
+        import sys
+        print(f'[paste] {msg}', file=sys.stderr, flush=True)
 
 
 def main(args: list[str]) -> str:
     return ''
 
 
+class _Paste:
+    def __init__(self, boss, window_id: int) -> None:
+        self.boss = boss
+        self.window_id = window_id
+        self.started = time.monotonic()
+        self.out: str | None = None
+        self.done = threading.Event()
+        self.proc = subprocess.Popen(
+            [HELPER], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, start_new_session=True,
+        )
+        threading.Thread(target=self._wait, name='kitty-smart-paste', daemon=True).start()
+        add_timer(self._poll, POLL_S, False)
+
+    def _wait(self) -> None:
+        # Worker thread: only talks to the subprocess.
+        try:
+            self.out, _ = self.proc.communicate(timeout=TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            self._kill()
+            self.proc.communicate()
+        except Exception:
+            pass
+        finally:
+            self.done.set()
+
+    def _poll(self, timer_id=None) -> None:
+        # Main thread (kitty timer).
+        window = self.boss.window_id_map.get(self.window_id)
+        if window is None:
+            if not self.done.is_set():
+                self._kill()
+            _dbg(f'window {self.window_id} closed after {self._ms():.0f}ms; cancelled')
+            return
+        if not self.done.is_set():
+            add_timer(self._poll, POLL_S, False)
+            return
+        if self.out:
+            window.paste_text(self.out)
+        _dbg(f'window {self.window_id}: {len(self.out or "")} chars in {self._ms():.0f}ms')
+
+    def _kill(self) -> None:
+        # The helper's own children (wl-paste, converters) share its group.
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+
 @result_handler(no_ui=True)
 def handle_result(args: list[str], answer: str, target_window_id: int, boss) -> None:
-    window = boss.window_id_map.get(target_window_id)
-    if window is None:
+    if boss.window_id_map.get(target_window_id) is None:
         return
     try:
-        out = subprocess.run(
-            ['/home/mason/scripts/wezterm-paste-image'],
-            capture_output=True, text=True, timeout=10,
-        ).stdout
+        _Paste(boss, target_window_id)
     except Exception:
         return
-    if out:
-        window.paste_text(out)
@@ -1,32 +1,61 @@
 # Event-driven header refresh: agent hooks set user vars via OSC 1337
-# SetUserVar; re-evaluate header visibility and redraw immediately instead
-# of waiting for the 2s timer in tab_bar.py (mirrors wezterm's
-# user-var-changed → invalidate flow; the check is cheap).
+# SetUserVar, and the terminal-header daemon sets terminal_header over the
+# remote-control socket whenever a header changes; re-evaluate header
+# visibility and redraw promptly instead of waiting for the fallback timer
+# (mirrors wezterm's user-var-changed → invalidate flow). Coalescing and the
+# check itself live in header_state.py, the same instance tab_bar.py draws
+# from.
 
 import importlib.util
 import os
+import sys
 from typing import Any
 
 from kitty.boss import Boss
 from kitty.window import Window
 
-_tab_bar_module = None
+_STATE_MODULE = 'kitty_terminal_header_state'
 
 
-def _tab_bar():
-    global _tab_bar_module
-    if _tab_bar_module is None:
-        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tab_bar.py')
-        spec = importlib.util.spec_from_file_location('lmtt_header_tab_bar', path)
+def _header_state():
+    # Same loader as tab_bar.py: one shared instance via sys.modules.
+    mod = sys.modules.get(_STATE_MODULE)
+    if mod is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'header_state.py')
+        spec = importlib.util.spec_from_file_location(_STATE_MODULE, path)
         mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        _tab_bar_module = mod
-    return _tab_bar_module
+        sys.modules[_STATE_MODULE] = mod
+        try:
+            spec.loader.exec_module(mod)
+        except BaseException:
+            del sys.modules[_STATE_MODULE]
+            raise
+    return mod
+
+
+def on_focus_change(boss: Boss, window: Window, data: dict[str, Any]) -> None:
+    if not data.get('focused'):
+        return
+    try:
+        _header_state().focus_changed(window)
+    except Exception:
+        pass
+
+
+def on_close(boss: Boss, window: Window, data: dict[str, Any]) -> None:
+    try:
+        _header_state().window_closed(window)
+    except Exception:
+        pass
 
 
 def on_set_user_var(boss: Boss, window: Window, data: dict[str, Any]) -> None:
     try:
-        _tab_bar().check_visibility()
+        if data.get('key') == 'terminal_header_stats':
+            # `kitten @ set-user-vars terminal_header_stats=1` dumps stats now.
+            _header_state().dump_stats(force=True)
+            return
+        _header_state().user_var_changed(window)
     except Exception:
         tab = window.tabref()
         if tab is not None:
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for chezmoi-package-check.py.
+
+Builds a synthetic chezmoi tree (hundreds of hypr config files, a large
+packages.toml) under a throwaway HOME, stubs flatpak/cargo/rpm/npm and the
+claude binary, and runs the checker with --profile-phases in three scenarios:
+
+    cold     --no-cache every run: full scan, every probe
+    warm     caches primed by a previous run
+    touched  warm, but a slice of the hypr files changed before each run
+
+PATH contains only the stubs (plus bash and sleep), so nothing on the host is probed
+and the same --seed always produces the same tree. Prints per-phase medians
+as JSON.
+
+Usage:
+    chezmoi-package-check-bench.py [--hypr-files N] [--entries N] [--runs N]
+                                   [--touch N] [--claude-latency SECS] [--seed N] [--keep]
+"""
+
+import argparse
+import json
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+CHECKER = next((p for p in (HERE / "chezmoi-package-check.py",
+                            HERE / "executable_chezmoi-package-check.py") if p.is_file()), None)
+
+
+def write_stub(bin_dir, name, body):
+    path = bin_dir / name
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(0o755)
+
+
+def build_tree(root, rng, hypr_files, entries):
+    """Synthetic HOME: chezmoi source tree, stub bin dir, verify markers."""
+    home = root / "home"
+    src = home / ".local" / "share" / "chezmoi"
+    bin_dir = root / "bin"
+    markers = home / "markers"
+    for d in (src / "software_installers", src / "scripts", bin_dir, markers,
+              home / ".local" / "bin", home / ".local" / "share" / "flatpak" / "app"):
+        d.mkdir(parents=True, exist_ok=True)
+    for tool in ("bash", "sleep"):
+        (bin_dir / tool).symlink_to(shutil.which(tool))
+
+    # Manifest: a mix of in-process probes (command -v, flatpak) and forked
+    # ones ([ -e ... ]), ~70% installed, some depends_on chains.
+    lines = []
+    apps = []
+    for i in range(entries):
+        key = f"pkg_{i:04d}"
+        installed = rng.random() < 0.7
+        kind = i % 4
+        if kind == 0:
+            verify = f"command -v tool-{i}"
+            if installed:
+                write_stub(bin_dir, f"tool-{i}", "exit 0")
+            apps.append(f"tool-{i}")
+        elif kind == 1:
+            app_id = f"org.bench.App{i}"
+            verify = f"flatpak list --app | grep -q {app_id}"
+            if installed:
+                (home / ".local" / "share" / "flatpak" / "app" / app_id).mkdir()
+        elif kind == 2:
+            verify = f"[ -e ~/markers/pkg-{i} ]"
+            if installed:
+                (markers / f"pkg-{i}").touch()
+        else:
+            verify = f"command -v alt-{i} || command -v tool-{i}"
+            if installed:
+                write_stub(bin_dir, f"alt-{i}", "exit 0")
+        lines += [f"[{key}]",
+                  f'description = "Synthetic package {i}"',
+                  f'profile = "{rng.choice(["common", "common", "personal", "work"])}"',
+                  f"priority = {rng.randint(1, 30)}",
+                  f'verify = "{verify}"']
+        if i > 4 and rng.random() < 0.1:
+            lines.append(f'depends_on = ["pkg_{i - rng.randint(1, 4):04d}"]')
+        if rng.random() < 0.1:
+            lines.append("optional = true")
+        lines.append("")
+    (src / "software_installers" / "packages.toml").write_text("\n".join(lines))
+
+    # hypr tree: nested dirs, exec/bind lines naming tracked and untracked apps
+    hypr = src / "dot_config" / "hypr"
+    for i in range(hypr_files):
+        d = hypr / f"group{i % 12}"
+        d.mkdir(parents=True, exist_ok=True)
+        body = [f"# synthetic hypr config {i}"]
+        for _ in range(rng.randint(5, 40)):
+            app = rng.choice(apps) if rng.random() < 0.8 else f"untracked-{rng.randint(0, 50)}"
+            body.append(rng.choice([f"exec-once = {app} --flag",
+                                    f"bind = SUPER, {rng.randint(0, 9)}, exec, {app}",
+                                    f"general {{ gaps_in = {rng.randint(0, 9)} }}"]))
+        (d / f"conf{i}.conf").write_text("\n".join(body) + "\n")
+    for name in ("btop", "kitty", "nvim", "private_zed", "systemd"):
+        (src / "dot_config" / name).mkdir(parents=True, exist_ok=True)
+    for i in range(30):
+        (src / "scripts" / f"executable_script-{i}").write_text("#!/bin/sh\n")
+
+    # Inventory stubs. No pacman: the tree looks like Fedora.
+    flatpaks = "\\n".join(f"org.bench.Extra{i}" for i in range(40))
+    write_stub(bin_dir, "flatpak", f"printf '{flatpaks}\\n'")
+    crates = "".join(f"crate-{i} v0.{i}.0:\\n    crate-{i}\\n" for i in range(25))
+    write_stub(bin_dir, "cargo", f"printf '{crates}'")
+    rpms = "\\n".join(f"rpm-package-{i}" for i in range(1500))
+    write_stub(bin_dir, "rpm", f"printf '{rpms}\\n'")
+    # npm: only `npm prefix -g` runs; the checker lists its node_modules.
+    npm_prefix = root / "npm-global"
+    for name in [f"npm-tool-{i}" for i in range(10)] + ["npm", "@scope/scoped-tool"]:
+        (npm_prefix / "lib" / "node_modules" / name).mkdir(parents=True, exist_ok=True)
+    write_stub(bin_dir, "npm", f"echo '{npm_prefix}'")
+    return home, bin_dir, hypr
+
+
+def write_claude_stub(home, latency):
+    """Stub claude: streams a findings block as partial text deltas after
+    `latency` seconds, then closing prose and a result a second later (which
+    the checker should never wait for)."""
+    findings = '<findings>{"missing":[],"untracked":[]}</findings>'
+    head = [
+        {"type": "system", "subtype": "init"},
+        {"type": "stream_event", "event": {"type": "message_start"}},
+        *({"type": "stream_event", "event": {"type": "content_block_delta",
+                                             "delta": {"type": "text_delta", "text": chunk}}}
+          for chunk in (findings[:20], findings[20:])),
+    ]
+    tail = [
+        {"type": "assistant", "message": {"content": [{"type": "text", "text": findings + " All clear."}]}},
+        {"type": "result", "result": findings + " All clear."},
+    ]
+    body = (f"sleep {latency}\n"
+            + "".join(f"echo '{json.dumps(e)}'\n" for e in head)
+            + "sleep 1\n"
+            + "".join(f"echo '{json.dumps(e)}'\n" for e in tail))
+    write_stub(home / ".local" / "bin", "claude", body)
+
+
+def run_checker(root, home, bin_dir, extra_args):
+    out = root / "profile.json"
+    env = {"HOME": str(home), "PATH": str(bin_dir), "XDG_CACHE_HOME": str(root / "cache"),
+           "LANG": "C.UTF-8"}
+    # New session: no controlling TTY, so the fixer prompt can't block.
+    subprocess.run([sys.executable, str(CHECKER), "--profile-phases", str(out), *extra_args],
+                   env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, start_new_session=True, check=False)
+    return json.loads(out.read_text())
+
+
+def touch_files(hypr, rng, count):
+    files = sorted(hypr.rglob("*.conf"))
+    for f in rng.sample(files, min(count, len(files))):
+        with f.open("a") as fh:
+            fh.write(f"exec-once = touched-{rng.randint(0, 9)}\n")
+
+
+def median(values):
+    return round(statistics.median(values), 2)
+
+
+def summarize(reports):
+    phases = {}
+    for r in reports:
+        for p in r["phases"]:
+            phases.setdefault(p["phase"], []).append(p)
+    return {
+        "total_wall_ms": median(r["total_wall_ms"] for r in reports),
+        "subprocesses": median(r["subprocesses"] for r in reports),
+        "phases": {name: {"wall_ms": median(p["wall_ms"] for p in ps),
+                          "cpu_ms": median(p["cpu_ms"] for p in ps),
+                          "subprocesses": median(p["subprocesses"] for p in ps)}
+                   for name, ps in phases.items()},
+        "collectors": {name: {"wall_ms": median(r["collectors"][name]["wall_ms"] for r in reports),
+                              "cpu_ms": median(r["collectors"][name]["cpu_ms"] for r in reports)}
+                       for name in reports[0].get("collectors", {})},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for chezmoi-package-check.py.")
+    parser.add_argument("--hypr-files", type=int, default=400)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--touch", type=int, default=10, help="hypr files changed per 'touched' run")
+    parser.add_argument("--claude-latency", type=float, default=0.0,
+                        help="seconds the stub claude sleeps before answering")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic tree and print its path")
+    args = parser.parse_args()
+
+    if CHECKER is None:
+        sys.exit("chezmoi-package-check.py not found next to this script")
+
+    rng = random.Random(args.seed)
+    root = Path(tempfile.mkdtemp(prefix="package-check-bench-"))
+    try:
+        home, bin_dir, hypr = build_tree(root, rng, args.hypr_files, args.entries)
+        write_claude_stub(home, args.claude_latency)
+
+        results = {"cold": [], "warm": [], "touched": []}
+        for _ in range(args.runs):
+            results["cold"].append(run_checker(root, home, bin_dir, ["--no-cache"]))
+        run_checker(root, home, bin_dir, [])  # prime the caches
+        for _ in range(args.runs):
+            results["warm"].append(run_checker(root, home, bin_dir, []))
+        for _ in range(args.runs):
+            touch_files(hypr, rng, args.touch)
+            results["touched"].append(run_checker(root, home, bin_dir, []))
+
+        print(json.dumps({
+            "params": {k: v for k, v in vars(args).items() if k != "keep"},
+            "scenarios": {name: summarize(reports) for name, reports in results.items()},
+        }, indent=2))
+    finally:
+        if args.keep:
+            print(f"tree kept at {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
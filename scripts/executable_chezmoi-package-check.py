@@ -1,23 +1,39 @@
 #!/usr/bin/env python3
 """
 Chezmoi package checker.
-Uses Claude haiku to audit manifest packages AND detect untracked drift.
+Audits manifest packages AND detects untracked drift locally; Claude haiku is
+only brought in when there are findings to explain or fix. Each audit's
+findings and review are snapshotted; findings already reviewed last time
+reuse that review, so an unchanged system skips haiku (the fixer session is
+still offered).
 
 Usage:
-    chezmoi-package-check.py
+    chezmoi-package-check.py [--jobs N] [--timeout SECS] [--no-cache] [--cache-stats]
+                             [--prompt-budget BYTES] [--profile-phases [FILE]]
 """
 
+import argparse
+import hashlib
 import json
 import os
 import re
+import shutil
+import signal
 import socket
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import tomllib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 
 CHEZMOI_DIR = Path.home() / ".local" / "share" / "chezmoi"
 REGISTRY = CHEZMOI_DIR / "software_installers" / "packages.toml"
 CLAUDE_BIN = Path.home() / ".local" / "bin" / "claude"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "chezmoi-package-check"
 
 
 def detect_profile():
@@ -35,109 +51,835 @@ def read_manifest():
     return REGISTRY.read_text()
 
 
-def collect_drift_data():
-    """Pre-compute all data for drift detection so haiku doesn't need to explore."""
-    dot_config = CHEZMOI_DIR / "dot_config"
-    skip_dirs = {"environment.d", "systemd", "udev", "xdg-desktop-portal", "autostart", "git", "ags"}
-
-    # 1. Config directories
-    config_dirs = []
-    if dot_config.is_dir():
-        for d in sorted(dot_config.iterdir()):
-            if d.is_dir():
-                name = d.name.removeprefix("private_")
-                if name not in skip_dirs and not re.match(r"^gtk-\d", name):
-                    config_dirs.append(name)
-
-    # 2. Hyprland exec apps
-    hypr_dir = dot_config / "hypr"
-    skip_cmds = {"sleep", "sed", "killall", "systemctl", "dbus-update-activation-environment",
-                 "gsettings", "pkill", "pgrep", "sh", "bash", "env",
-                 # sub-binaries from larger packages — not standalone installs
-                 "gnome-keyring-daemon", "wpctl", "wl-copy", "wl-paste"}
-    hypr_exec = set()
-    hypr_binds = set()
-
-    if hypr_dir.is_dir():
-        for f in hypr_dir.rglob("*"):
-            if not f.is_file():
-                continue
+def load_manifest(text=None):
+    """Parse packages.toml into {key: entry}. Only top-level tables are entries."""
+    data = tomllib.loads(read_manifest() if text is None else text)
+    return {k: v for k, v in data.items() if isinstance(v, dict)}
+
+
+def select_entries(manifest, profile, include_optional=False):
+    """Entries that apply to this profile, in install-priority order."""
+    selected = []
+    for key, entry in manifest.items():
+        if entry.get("profile", "common") not in ("common", profile):
+            continue
+        if entry.get("optional") and not include_optional:
+            continue
+        selected.append((key, entry))
+    return sorted(selected, key=lambda kv: (kv[1].get("priority", 99), kv[0]))
+
+
+def entry_verify(key, entry):
+    """The entry's verify command, or `command -v <key>` when it has none."""
+    return entry.get("verify") or f"command -v {key}"
+
+
+def _ms(seconds):
+    return round(max(seconds, 0.0) * 1000, 2)
+
+
+class PhaseProfiler:
+    """Wall time, CPU time and subprocess count per named phase.
+
+    CPU is this process (all threads) plus reaped children. Inventory
+    collectors run in the background across phases, so their subprocesses
+    and child CPU are reported under "collectors" and left out of whichever
+    phase they happened to start or finish in. Enabled by --profile-phases;
+    otherwise phase() is a no-op."""
+
+    def __init__(self):
+        self.phases = []
+        self.spawns = 0
+        self.extra = {}
+        self._collector_spawns = 0
+        self._collector_cpu = 0.0
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def spawned(self):
+        with self._lock:
+            self.spawns += 1
+
+    def collector_reaped(self, spawns, cpu_s):
+        with self._lock:
+            self._collector_spawns += spawns
+            self._collector_cpu += cpu_s
+
+    @contextmanager
+    def phase(self, name):
+        t = os.times()
+        wall, spawns, collector_cpu = time.monotonic(), self.spawns, self._collector_cpu
+        try:
+            yield
+        finally:
+            u = os.times()
+            self.phases.append({
+                "phase": name,
+                "wall_ms": _ms(time.monotonic() - wall),
+                "cpu_ms": _ms(u.user + u.system - t.user - t.system),
+                "child_cpu_ms": _ms(u.children_user + u.children_system
+                                    - t.children_user - t.children_system
+                                    - (self._collector_cpu - collector_cpu)),
+                "subprocesses": self.spawns - spawns,
+            })
+
+    def report(self):
+        return {"total_wall_ms": _ms(time.monotonic() - self._start),
+                "subprocesses": self.spawns + self._collector_spawns,
+                "phases": self.phases, **self.extra}
+
+
+PROFILER = None
+PROFILE_OUTPUT = "-"
+
+
+def emit_profile():
+    """Write the --profile-phases report (once): JSON to PROFILE_OUTPUT, or
+    stderr for "-" so stdout keeps the human-readable audit."""
+    global PROFILER
+    if not PROFILER:
+        return
+    report, PROFILER = PROFILER.report(), None
+    text = json.dumps(report, indent=2)
+    if PROFILE_OUTPUT == "-":
+        print(text, file=sys.stderr)
+    else:
+        Path(PROFILE_OUTPUT).write_text(text + "\n")
+
+
+def phase(name):
+    return PROFILER.phase(name) if PROFILER else nullcontext()
+
+
+def count_spawn():
+    if PROFILER:
+        PROFILER.spawned()
+
+
+VERIFY_JOBS = 8
+VERIFY_TIMEOUT = 10
+
+
+def run_verify(cmd, timeout=VERIFY_TIMEOUT):
+    """Run one verify command through bash. Returns (status, exit_code).
+
+    The probe gets its own session so a timeout kills the whole pipeline
+    (`fc-list | grep ...`), not just the outer bash."""
+    count_spawn()
+    try:
+        proc = subprocess.Popen(
+            ["bash", "-c", cmd],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+    except OSError:
+        return "error", None
+    try:
+        code = proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        proc.wait()
+        return "timeout", None
+    return ("ok" if code == 0 else "missing"), code
+
+
+FLATPAK_APP_DIRS = [Path("/var/lib/flatpak/app"), Path.home() / ".local" / "share" / "flatpak" / "app"]
+CARGO_CRATES_JSON = Path.home() / ".cargo" / ".crates2.json"
+
+_path_listings = {}
+_crates2_names = None
+
+
+def _on_path(name):
+    """`command -v name` for executables, from one cached listing per PATH dir."""
+    for d in os.environ.get("PATH", "").split(os.pathsep):
+        if not d:
+            continue
+        listing = _path_listings.get(d)
+        if listing is None:
             try:
-                content = f.read_text()
-            except (OSError, UnicodeDecodeError):
-                continue
+                listing = set(os.listdir(d))
+            except OSError:
+                listing = set()
+            _path_listings[d] = listing
+        if name in listing and os.access(os.path.join(d, name), os.X_OK):
+            return True
+    return False
+
+
+def _flatpak_installed(app_id):
+    return any((d / app_id).is_dir() for d in FLATPAK_APP_DIRS)
+
+
+def _cargo_installed(crate):
+    global _crates2_names
+    if _crates2_names is None:
+        try:
+            installs = json.loads(CARGO_CRATES_JSON.read_text()).get("installs", {})
+        except (OSError, ValueError, AttributeError):
+            installs = {}
+        # keys look like "ripgrep 14.1.0 (registry+https://...)"
+        _crates2_names = {k.split()[0] for k in installs} | {
+            b for v in installs.values() if isinstance(v, dict) for b in v.get("bins", [])}
+    return crate in _crates2_names
+
+
+# Verify terms answered without a fork: regex -> check(match group).
+INPROCESS_PROBES = [
+    (re.compile(r"command -v ([\w.+-]+)"), _on_path),
+    (re.compile(r"flatpak list(?: --app)? \| grep -q ([\w.-]+)"), _flatpak_installed),
+    (re.compile(r"cargo install --list \| grep -q ([\w-]+)"), _cargo_installed),
+    # Plain paths only: quoted or $VAR paths need bash to expand them.
+    (re.compile(r"test -x ([^\s$'\"`]+)"), lambda p: os.access(os.path.expanduser(p), os.X_OK)),
+]
+
+
+def probe_inprocess(cmd):
+    """Answer a verify command without bash when every term of its
+    `a && b || c` chain matches INPROCESS_PROBES. Returns True/False, or
+    None when the command needs a real shell."""
+    parts = re.split(r"\s*(&&|\|\|)\s*", cmd.strip())
+    terms = []
+    for term in parts[::2]:
+        for pattern, check in INPROCESS_PROBES:
+            m = pattern.fullmatch(term)
+            if m:
+                terms.append((check, m.group(1)))
+                break
+        else:
+            return None
+
+    # bash: && and || have equal precedence, left-associative, short-circuit
+    check, arg = terms[0]
+    ok = check(arg)
+    for op, (check, arg) in zip(parts[1::2], terms[1:]):
+        if (op == "&&") == ok:
+            ok = check(arg)
+    return ok
+
+
+# Besides PATH: where the other kinds of verify probes look. Installing or
+# removing something touches at least one of these, which changes the
+# environment fingerprint and invalidates every cached outcome.
+FINGERPRINT_PATHS = [
+    Path("/var/lib/flatpak/app"),
+    Path.home() / ".local" / "share" / "flatpak" / "app",
+    Path.home() / ".cargo" / ".crates2.json",
+    Path("/var/lib/rpm"),
+    Path("/var/lib/pacman/local"),
+    Path("/usr/share/fonts"),
+    Path.home() / ".local" / "share" / "fonts",
+]
+
+
+def env_fingerprint():
+    """Cheap hash of everything verify probes depend on: stat() of each PATH
+    directory plus FINGERPRINT_PATHS. No directory listings, no forks."""
+    parts = []
+    path_dirs = os.environ.get("PATH", "").split(os.pathsep)
+    for p in [*path_dirs, *map(str, FINGERPRINT_PATHS)]:
+        try:
+            st = os.stat(p)
+            parts.append(f"{p}:{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append(f"{p}:-")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
 
-            for m in re.finditer(r"(?:exec-once|exec)\s*=\s*(.*)", content):
-                cmd = m.group(1).strip().lstrip("[").split()[0].split("/")[-1]
-                if cmd and cmd not in skip_cmds:
-                    hypr_exec.add(cmd)
-
-            for m in re.finditer(r"bind.*exec,\s*(\S+)", content):
-                cmd = m.group(1).split()[0].split("/")[-1]
-                if cmd and not cmd.startswith("$") and cmd != "exec" and not re.match(r".*\.(sh|js|py)$", cmd):
-                    hypr_binds.add(cmd)
-
-    # 3. Script names
-    scripts_dir = CHEZMOI_DIR / "scripts"
-    script_names = []
-    if scripts_dir.is_dir():
-        for f in sorted(scripts_dir.iterdir()):
-            script_names.append(f.name.removeprefix("executable_"))
-
-    # 4. Flatpak apps
-    flatpak_apps = ""
+class VerifyCache:
+    """Verify outcomes persisted in $XDG_CACHE_HOME, keyed on the entry's TOML
+    content + profile + env_fingerprint(). Entries expire after `ttl` seconds
+    and the oldest are evicted beyond `max_entries`. Only ok/missing outcomes
+    are stored; timeouts and errors are always re-probed."""
+
+    PATH = CACHE_DIR / "verify.json"
+    TTL = 24 * 3600
+    MAX_ENTRIES = 512
+    CACHEABLE = ("ok", "missing")
+
+    def __init__(self, profile, ttl=TTL, max_entries=MAX_ENTRIES):
+        self.profile = profile
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fingerprint = env_fingerprint()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0}
+        self.entries = self._load()
+        self.dirty = False
+
+    def _load(self):
+        try:
+            data = json.loads(self.PATH.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != 1:
+            return {}
+        entries = data.get("entries", {})
+        now = time.time()
+        fresh = {h: e for h, e in entries.items() if now - e.get("stored", 0) < self.ttl}
+        self.stats["expired"] = len(entries) - len(fresh)
+        return fresh
+
+    def _hash(self, key, entry):
+        blob = json.dumps([key, entry, self.profile, self.fingerprint], sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def get(self, key, entry):
+        cached = self.entries.get(self._hash(key, entry))
+        if cached is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return {"key": key, "status": cached["status"], "exit_code": cached["exit_code"],
+                "duration_ms": 0.0, "cached": True}
+
+    def put(self, key, entry, result):
+        if result["status"] not in self.CACHEABLE:
+            return
+        self.entries[self._hash(key, entry)] = {
+            "key": key, "status": result["status"], "exit_code": result["exit_code"],
+            "stored": time.time(),
+        }
+        self.stats["stores"] += 1
+        self.dirty = True
+
+    def save(self):
+        if len(self.entries) > self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda kv: kv[1]["stored"], reverse=True)
+            self.stats["evicted"] = len(self.entries) - self.max_entries
+            self.entries = dict(keep[:self.max_entries])
+            self.dirty = True
+        if not (self.dirty or self.stats["expired"]):
+            return
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = self.PATH.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"version": 1, "entries": self.entries}))
+            os.replace(tmp, self.PATH)
+        except OSError:
+            pass
+
+    def summary(self):
+        try:
+            size = self.PATH.stat().st_size
+        except OSError:
+            size = 0
+        s = self.stats
+        return (f"verify cache: {s['hits']} hits, {s['misses']} misses, {s['stores']} stored, "
+                f"{s['expired']} expired, {s['evicted']} evicted "
+                f"({len(self.entries)} entries, {size / 1024:.1f} KB at {self.PATH})")
+
+
+def _verify_entry(key, entry, timeout):
+    start = time.monotonic()
+    cmd = entry_verify(key, entry)
+    ok = probe_inprocess(cmd)
+    if ok is None:
+        probe = "fork"
+        status, code = run_verify(cmd, timeout)
+    else:
+        probe = "in-process"
+        status, code = ("ok", 0) if ok else ("missing", 1)
+    return {"key": key, "status": status, "exit_code": code, "probe": probe,
+            "duration_ms": round((time.monotonic() - start) * 1000, 1)}
+
+
+def probe_summary(results):
+    counts = {"in-process": 0, "fork": 0, "cached": 0}
+    for r in results.values():
+        if r.get("cached"):
+            counts["cached"] += 1
+        elif "probe" in r:
+            counts[r["probe"]] += 1
+    return (f"{sum(counts.values())} probes: {counts['in-process']} in-process, "
+            f"{counts['fork']} forked, {counts['cached']} cached")
+
+
+def run_verifies(entries, jobs=VERIFY_JOBS, timeout=VERIFY_TIMEOUT, cache=None):
+    """Run verify probes for [(key, entry)] concurrently, at most `jobs` at once.
+
+    Probes are read-only, so depends_on doesn't order them: every entry is
+    probed, and one that fails while a selected dependency also failed gets
+    a "blocked_by" list (the dependency is likely the thing to fix).
+    Dependencies outside the selection are ignored. With a VerifyCache,
+    cached outcomes are used as-is and only the rest are probed. Returns
+    {key: result} with status ok | missing | timeout | error, exit_code and
+    duration_ms."""
+    entries = dict(entries)
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for key in sorted(entries):
+            cached = cache.get(key, entries[key]) if cache else None
+            if cached:
+                results[key] = cached
+            else:
+                running[pool.submit(_verify_entry, key, entries[key], timeout)] = key
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                results[key] = future.result()
+                if cache:
+                    cache.put(key, entries[key], results[key])
+    if cache:
+        cache.save()
+
+    for key, entry in entries.items():
+        if results[key]["status"] == "ok":
+            continue
+        failed = [d for d in entry.get("depends_on", [])
+                  if d in entries and d != key and results[d]["status"] != "ok"]
+        if failed:
+            results[key]["blocked_by"] = failed
+    return results
+
+
+CONFIG_SKIP_DIRS = {"environment.d", "systemd", "udev", "xdg-desktop-portal", "autostart", "git", "ags"}
+HYPR_SKIP_CMDS = {"sleep", "sed", "killall", "systemctl", "dbus-update-activation-environment",
+                  "gsettings", "pkill", "pgrep", "sh", "bash", "env",
+                  # sub-binaries from larger packages — not standalone installs
+                  "gnome-keyring-daemon", "wpctl", "wl-copy", "wl-paste"}
+DRIFT_INDEX = CACHE_DIR / "drift-index.json"
+
+
+def hypr_commands(content):
+    """(exec apps, keybind apps) referenced by one hypr config file."""
+    execs, binds = set(), set()
+    for m in re.finditer(r"(?:exec-once|exec)\s*=\s*(.*)", content):
+        parts = m.group(1).strip().lstrip("[").split()
+        cmd = parts[0].split("/")[-1] if parts else ""
+        if cmd and cmd not in HYPR_SKIP_CMDS:
+            execs.add(cmd)
+
+    for m in re.finditer(r"bind.*exec,\s*(\S+)", content):
+        cmd = m.group(1).split()[0].split("/")[-1]
+        if cmd and not cmd.startswith("$") and cmd != "exec" and not re.match(r".*\.(sh|js|py)$", cmd):
+            binds.add(cmd)
+    return execs, binds
+
+
+def load_drift_index():
     try:
-        flatpak_apps = subprocess.run(
-            ["flatpak", "list", "--app", "--columns=application"],
-            capture_output=True, text=True, timeout=10
-        ).stdout.strip()
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        pass
+        index = json.loads(DRIFT_INDEX.read_text())
+    except (OSError, ValueError):
+        return {}
+    return index if isinstance(index, dict) and index.get("version") == 1 else {}
+
 
-    # 5. Cargo tools
-    cargo_tools = ""
+def save_drift_index(index):
     try:
-        result = subprocess.run(
-            ["cargo", "install", "--list"],
-            capture_output=True, text=True, timeout=10
-        )
-        cargo_tools = "\n".join(
-            line.split()[0] for line in result.stdout.splitlines()
-            if line and not line.startswith(" ")
-        )
-    except (FileNotFoundError, subprocess.TimeoutExpired):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = DRIFT_INDEX.with_suffix(".tmp")
+        tmp.write_text(json.dumps({**index, "version": 1}))
+        os.replace(tmp, DRIFT_INDEX)
+    except OSError:
         pass
 
-    # 6. Manifest entry keys (top-level TOML table names)
-    manifest_text = read_manifest()
-    manifest_pkgs = sorted(set(re.findall(r'^\[(\w+)\]', manifest_text, re.MULTILINE)))
+
+def indexed_listing(index, slot, directory, list_fn):
+    """list_fn(directory), reused from the index while the directory's own
+    mtime is unchanged (adding, removing or renaming an entry bumps it)."""
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except OSError:
+        index.pop(slot, None)
+        return []
+    cached = index.get(slot)
+    if cached and cached.get("mtime") == mtime:
+        return cached["names"]
+    names = list_fn(directory)
+    index[slot] = {"mtime": mtime, "names": names}
+    return names
+
+
+def _config_dir_names(dot_config):
+    names = []
+    for d in sorted(dot_config.iterdir()):
+        if d.is_dir():
+            name = d.name.removeprefix("private_")
+            if name not in CONFIG_SKIP_DIRS and not re.match(r"^gtk-\d", name):
+                names.append(name)
+    return names
+
+
+def _script_names(scripts_dir):
+    return [f.name.removeprefix("executable_") for f in sorted(scripts_dir.iterdir())]
+
+
+def scan_hypr(hypr_dir, index):
+    """Union of hypr_commands() over the tree. Files are stat()ed, but only
+    those whose (mtime, size) differ from the index are re-read; index rows
+    for files that no longer exist (deleted, renamed) are dropped."""
+    old = index.get("hypr", {})
+    files = {}
+    stack = [str(hypr_dir)] if hypr_dir.is_dir() else []
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir():
+                        stack.append(e.path)
+                        continue
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                except OSError:
+                    continue
+                rel = os.path.relpath(e.path, hypr_dir)
+                row = old.get(rel)
+                if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+                    files[rel] = row
+                    continue
+                try:
+                    with open(e.path, encoding="utf-8") as f:
+                        execs, binds = hypr_commands(f.read())
+                except (OSError, UnicodeDecodeError):
+                    execs, binds = set(), set()
+                files[rel] = [st.st_mtime_ns, st.st_size, sorted(execs), sorted(binds)]
+    index["hypr"] = files
+
+    hypr_exec, hypr_binds = set(), set()
+    for _, _, execs, binds in files.values():
+        hypr_exec.update(execs)
+        hypr_binds.update(binds)
+    return hypr_exec, hypr_binds
+
+
+COLLECTOR_TIMEOUT = 10
+
+
+def _flatpak_apps(out):
+    return out.split()
+
+
+def _cargo_crates(out):
+    return [line.split()[0] for line in out.splitlines() if line and not line.startswith(" ")]
+
+
+def _npm_globals(out):
+    # npm and corepack ship with node itself
+    return [name for name in out.split() if name not in ("npm", "corepack")]
+
+
+def _lines(out):
+    return [line.strip() for line in out.splitlines() if line.strip()]
+
+
+NPM_PREFIX_CACHE = CACHE_DIR / "npm-prefix.json"
+
+
+def _npm_prefix_key(npm):
+    """What `npm prefix -g` depends on: the npm install, the user's npmrc and
+    the prefix override in the environment."""
+    npm = os.path.realpath(npm)
+    parts = [npm, os.environ.get("NPM_CONFIG_PREFIX") or os.environ.get("npm_config_prefix")]
+    for path in (npm, Path.home() / ".npmrc"):
+        try:
+            parts.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            parts.append(None)
+    return json.dumps(parts)
+
+
+def _npm_global_listing(timeout):
+    """Global npm packages as the names under $(npm prefix -g)/lib/node_modules.
+
+    Starting npm costs most of a second, so `npm prefix -g` only runs when
+    its inputs change (NPM_PREFIX_CACHE); listing the directory is cheap."""
+    npm = shutil.which("npm")
+    if npm is None:
+        raise FileNotFoundError("npm")
+    key, spawns, cpu = _npm_prefix_key(npm), 0, 0.0
+    try:
+        cached = json.loads(NPM_PREFIX_CACHE.read_text())
+    except (OSError, ValueError):
+        cached = {}
+    prefix = cached.get("prefix") if isinstance(cached, dict) and cached.get("key") == key else None
+    if prefix is None:
+        status, out, error, cpu, spawns = _run_child([npm, "prefix", "-g"], timeout)
+        if status != "ok" or not out.strip():
+            raise OSError(error or "npm prefix -g printed nothing")
+        prefix = out.strip()
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            NPM_PREFIX_CACHE.write_text(json.dumps({"key": key, "prefix": prefix}))
+        except OSError:
+            pass
+    names = []
+    root = Path(prefix) / "lib" / "node_modules"
+    try:
+        for entry in os.scandir(root):
+            if entry.name.startswith("@") and entry.is_dir():
+                names += [f"{entry.name}/{sub.name}" for sub in os.scandir(entry.path)
+                          if not sub.name.startswith(".")]
+            elif not entry.name.startswith("."):
+                names.append(entry.name)
+    except FileNotFoundError:
+        pass  # nothing installed globally yet
+    return "\n".join(names), spawns, cpu
+
+
+# Installed-inventory collectors: drift data key -> (argv, stdout parser).
+# Each runs as its own subprocess, concurrently; add an entry here to feed a
+# new inventory into the audit. System packages come from whichever package
+# manager exists (the other one reports "unavailable"). Instead of argv, a
+# collector can be a function of the timeout returning (text for the parser,
+# subprocesses, child CPU seconds), for inventories cheaper to read directly.
+COLLECTORS = {
+    "flatpak_apps": (["flatpak", "list", "--app", "--columns=application"], _flatpak_apps),
+    "cargo_tools": (["cargo", "install", "--list"], _cargo_crates),
+    "rpm_pkgs": (["rpm", "-qa", "--queryformat", "%{NAME}\\n"], _lines),
+    "pacman_pkgs": (["pacman", "-Qq"], _lines),
+    "npm_globals": (_npm_global_listing, _npm_globals),
+}
+
+
+def _run_child(argv, timeout):
+    """Run argv to completion or timeout. Returns (status, stdout, error,
+    child CPU seconds, subprocesses) with status ok | error | timeout;
+    FileNotFoundError propagates.
+
+    The child is reaped here with wait4 so its CPU time is its own: collectors
+    run alongside the drift scan, and the process-wide children totals would
+    charge it to whichever phase happened to reap it."""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=out, stderr=err)
+        status, error = "ok", ""
+        deadline, delay = time.monotonic() + timeout, 0.001
+        while True:
+            pid, wstatus, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() >= deadline:
+                proc.kill()
+                _, wstatus, usage = os.wait4(proc.pid, 0)
+                status, error = "timeout", f"no output after {timeout}s"
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+        proc.returncode = os.waitstatus_to_exitcode(wstatus)
+        cpu = usage.ru_utime + usage.ru_stime
+        if PROFILER:
+            PROFILER.collector_reaped(1, cpu)
+        out.seek(0)
+        stdout = out.read().decode(errors="replace") if status == "ok" else ""
+        if status == "ok" and proc.returncode != 0 and not stdout.strip():
+            err.seek(0)
+            lines = err.read().decode(errors="replace").strip().splitlines()
+            status, error = "error", (lines or [f"exit {proc.returncode}"])[0]
+    return status, stdout, error, cpu, 1
+
+
+def run_collector(name, argv, parse, timeout=COLLECTOR_TIMEOUT):
+    """Run one inventory collector. Returns {name, status, items, duration_ms,
+    cpu_ms, subprocesses, error} where status is ok | unavailable | timeout |
+    error."""
+    start = time.monotonic()
+    status, items, error, cpu, spawns = "ok", [], "", 0.0, 0
+    try:
+        if callable(argv):
+            thread_cpu = time.thread_time()
+            stdout, spawns, cpu = argv(timeout)
+            cpu += time.thread_time() - thread_cpu
+        else:
+            status, stdout, error, cpu, spawns = _run_child(argv, timeout)
+        if status == "ok":
+            items = sorted(set(parse(stdout)))
+    except FileNotFoundError:
+        status = "unavailable"
+    except (OSError, ValueError) as e:
+        status, error = "error", str(e)
+    return {"name": name, "status": status, "items": items,
+            "duration_ms": round((time.monotonic() - start) * 1000, 1),
+            "cpu_ms": _ms(cpu), "subprocesses": spawns, "error": error}
+
+
+def collect_drift_data(use_index=True):
+    """Pre-compute all data for drift detection so haiku doesn't need to explore.
+
+    The filesystem half is incremental: DRIFT_INDEX in the cache dir keeps
+    per-file hypr extraction results and the dot_config/scripts listings, so
+    only changed files are re-read. use_index=False rescans from scratch
+    (the fresh index is still written). The COLLECTORS run in parallel with
+    the scan; their per-collector status lands in data["collectors"]."""
+    pool = ThreadPoolExecutor(max_workers=len(COLLECTORS))
+    pending = [pool.submit(run_collector, name, argv, parse)
+               for name, (argv, parse) in COLLECTORS.items()]
+
+    with phase("drift.scan"):
+        index = load_drift_index() if use_index else {}
+        dot_config = CHEZMOI_DIR / "dot_config"
+
+        # 1. Config directories
+        config_dirs = indexed_listing(index, "config_dirs", dot_config, _config_dir_names)
+
+        # 2. Hyprland exec apps
+        hypr_exec, hypr_binds = scan_hypr(dot_config / "hypr", index)
+
+        # 3. Script names
+        script_names = indexed_listing(index, "scripts", CHEZMOI_DIR / "scripts", _script_names)
+        save_drift_index(index)
+
+    # 4. Installed inventories (flatpak, cargo, system packages, npm)
+    with phase("drift.collectors_wait"):
+        collectors = [f.result() for f in pending]
+        pool.shutdown()
+    if PROFILER:
+        PROFILER.extra["collectors"] = {
+            c["name"]: {"status": c["status"], "wall_ms": c["duration_ms"],
+                        "cpu_ms": c["cpu_ms"], "subprocesses": c["subprocesses"]}
+            for c in collectors}
+
+    # 5. Manifest entry keys (top-level TOML table names)
+    with phase("drift.manifest"):
+        manifest_text = read_manifest()
+        manifest_pkgs = sorted(load_manifest(manifest_text))
 
     return {
         "config_dirs": "\n".join(config_dirs),
         "hypr_exec": "\n".join(sorted(hypr_exec)),
         "hypr_binds": "\n".join(sorted(hypr_binds)),
         "script_names": "\n".join(script_names),
-        "flatpak_apps": flatpak_apps,
-        "cargo_tools": cargo_tools,
+        **{c["name"]: "\n".join(c["items"]) for c in collectors},
         "manifest_pkgs": "\n".join(manifest_pkgs),
         "packages_toml": manifest_text,
+        "collectors": collectors,
     }
 
 
-def parse_stream_line(data):
-    """Extract progress info from a stream-json event."""
-    if data.get("type") == "assistant":
-        for block in data.get("message", {}).get("content", []):
-            if block.get("type") == "tool_use":
-                cmd = block.get("input", {}).get("command") or block.get("name", "working...")
-                return f"  > {cmd}"
-            elif block.get("type") == "text":
-                return f"\n{block['text']}"
-    return None
+FINDINGS_RE = re.compile(r"<findings>\s*(.*?)\s*</findings>", re.S)
+
+
+class ClaudeStream:
+    """Incremental parser for `claude -p --output-format stream-json` events.
+
+    feed() takes one decoded event and returns a progress line (or None).
+    It collects tool calls, completed text blocks, the final result and
+    token usage, and timestamps every event relative to start. If the model
+    emits a <findings>{json}</findings> block (from partial text deltas or
+    a completed text block), it is parsed as soon as the closing tag
+    arrives, and `done` turns true before the model's closing prose."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.events = []  # {"type", "t_ms", "gap_ms"}
+        self.tool_calls = []
+        self.text_blocks = []
+        self.result = None
+        self.usage = {}
+        self.ttft_ms = None
+        self.findings = None
+        self.stopped_early = False
+        self._partial = ""
+
+    @property
+    def done(self):
+        return self.result is not None or self.findings is not None
+
+    def _elapsed(self):
+        return round((time.monotonic() - self.start) * 1000, 1)
+
+    def _first_token(self):
+        if self.ttft_ms is None:
+            self.ttft_ms = self._elapsed()
+
+    def _scan_findings(self, text):
+        if self.findings is not None:
+            return
+        m = FINDINGS_RE.search(text)
+        if not m:
+            return
+        try:
+            findings = json.loads(m.group(1))
+        except ValueError:
+            return
+        if isinstance(findings, dict):
+            self.findings = {"missing": findings.get("missing") or [],
+                             "untracked": findings.get("untracked") or []}
+
+    def feed(self, data):
+        kind = data.get("type", "?")
+        t = self._elapsed()
+        prev = self.events[-1]["t_ms"] if self.events else 0.0
+        self.events.append({"type": kind, "t_ms": t, "gap_ms": round(t - prev, 1)})
+
+        if kind == "stream_event":
+            event = data.get("event", {})
+            if event.get("type") == "content_block_delta":
+                self._first_token()
+                delta = event.get("delta", {})
+                if delta.get("type") == "text_delta":
+                    self._partial += delta.get("text", "")
+                    self._scan_findings(self._partial)
+            elif event.get("type") == "message_start":
+                self._partial = ""
+            return None
+
+        if kind == "assistant":
+            message = data.get("message", {})
+            self.usage = message.get("usage") or self.usage
+            progress = None
+            for block in message.get("content", []):
+                self._first_token()
+                if block.get("type") == "tool_use":
+                    self.tool_calls.append({"name": block.get("name"), "input": block.get("input", {})})
+                    cmd = block.get("input", {}).get("command") or block.get("name", "working...")
+                    progress = f"  > {cmd}"
+                elif block.get("type") == "text":
+                    self.text_blocks.append(block.get("text", ""))
+                    self._scan_findings(block.get("text", ""))
+            return progress
+
+        if kind == "result":
+            self.result = data.get("result", "")
+            self.usage = data.get("usage") or self.usage
+            self._scan_findings(self.result)
+        return None
+
+    def text(self):
+        if self.result:
+            return self.result
+        return "\n".join(self.text_blocks) or self._partial
+
+    def timings(self):
+        gaps = [e["gap_ms"] for e in self.events]
+        by_type = {}
+        for e in self.events:
+            by_type[e["type"]] = by_type.get(e["type"], 0) + 1
+        return {
+            "events": len(self.events),
+            "events_by_type": by_type,
+            "first_event_ms": self.events[0]["t_ms"] if self.events else None,
+            "ttft_ms": self.ttft_ms,
+            "total_ms": self._elapsed(),
+            "max_gap_ms": max(gaps, default=None),
+            "tool_calls": len(self.tool_calls),
+            "stopped_early": self.stopped_early,
+            "usage": {k: v for k, v in self.usage.items() if k.endswith("tokens")},
+            "event_log": self.events,
+        }
+
+    def summary(self):
+        parts = []
+        if self.ttft_ms is not None:
+            parts.append(f"first token {self.ttft_ms / 1000:.1f}s")
+        parts.append(f"done {self._elapsed() / 1000:.1f}s" + (" (stopped at findings)" if self.stopped_early else ""))
+        if self.usage:
+            parts.append(f"{self.usage.get('input_tokens', 0)} in / {self.usage.get('output_tokens', 0)} out tokens")
+        return ", ".join(parts)
 
 
 def run_claude_check(claude_bin, system_prompt, user_prompt):
-    """Run claude in print mode with stream-json, showing progress. Returns final result text."""
+    """Run claude in print mode with stream-json, showing progress. Returns
+    the ClaudeStream; stops reading (and terminates claude) as soon as a
+    complete findings block has arrived."""
     cmd = [
         claude_bin, "--model", "haiku", "-p", "--verbose",
         "--output-format", "stream-json", "--include-partial-messages",
@@ -146,7 +888,8 @@ def run_claude_check(claude_bin, system_prompt, user_prompt):
         user_prompt,
     ]
 
-    result_text = ""
+    stream = ClaudeStream()
+    count_spawn()
     try:
         proc = subprocess.Popen(
             cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
@@ -160,20 +903,42 @@ def run_claude_check(claude_bin, system_prompt, user_prompt):
             except json.JSONDecodeError:
                 continue
 
-            # Show progress
-            progress = parse_stream_line(data)
+            progress = stream.feed(data)
             if progress:
                 print(progress, flush=True)
 
-            # Capture final result
-            if data.get("type") == "result":
-                result_text = data.get("result", "")
+            if stream.done:
+                break
 
+        if stream.result is None and stream.findings is not None:
+            stream.stopped_early = True
+            proc.terminate()
         proc.wait()
     except (OSError, KeyboardInterrupt):
         pass
 
-    return result_text
+    if PROFILER:
+        PROFILER.extra["claude"] = stream.timings()
+    return stream
+
+
+def format_review(findings):
+    """Human-readable report from a parsed findings block."""
+    lines = []
+    for title, items, name_key in (("Missing Manifest Packages", findings["missing"], "key"),
+                                   ("Untracked Dependencies", findings["untracked"], "name")):
+        if not items:
+            continue
+        if lines:
+            lines.append("")
+        lines.append(title)
+        for item in items:
+            if isinstance(item, dict):
+                note = f" — {item['note']}" if item.get("note") else ""
+                lines.append(f"  {item.get(name_key, '?')}{note}")
+            else:
+                lines.append(f"  {item}")
+    return "\n".join(lines)
 
 
 def run_claude_interactive(claude_bin, system_prompt, seed_message=""):
@@ -181,6 +946,7 @@ def run_claude_interactive(claude_bin, system_prompt, seed_message=""):
     args = [claude_bin, "--model", "haiku", "--system-prompt", system_prompt]
     if seed_message:
         args.append(seed_message)
+    emit_profile()
     os.execvp(claude_bin, args)
 
 
@@ -199,104 +965,433 @@ def prompt_user(question, timeout=120):
         return ""
 
 
-def run_audit(claude_bin, profile):
-    """Post-apply: check manifest packages are installed AND find untracked drift."""
-    data = collect_drift_data()
-    packages_toml = data["packages_toml"]
+def known_names(manifest):
+    """Every name the manifest accounts for: keys plus the words in each
+    description and verify command (so `nvim`, `fish`, `k9s` count as tracked).
+    Hyphenated names also contribute their first segment (hypr-de → hypr)."""
+    names = set()
+    for key, entry in manifest.items():
+        names.add(key.lower())
+        text = f"{entry.get('description', '')} {entry.get('verify', '')}".lower()
+        for word in re.findall(r"[\w.+-]+", text):
+            word = word.strip(".-").rsplit("/", 1)[-1]
+            if word:
+                names.add(word)
+                names.add(word.split("-")[0])
+    return names
 
-    system_prompt = f"""You are a system package auditor with TWO jobs. Be concise and fast — minimize Bash calls.
 
-PROFILE: {profile}
+def check_missing(manifest, profile, jobs=VERIFY_JOBS, timeout=VERIFY_TIMEOUT, cache=None):
+    """Run every applicable verify command. Returns (missing keys in priority
+    order, {key: result})."""
+    entries = select_entries(manifest, profile)
+    results = run_verifies(entries, jobs, timeout, cache)
+    return [key for key, _ in entries if results[key]["status"] != "ok"], results
 
-packages.toml:
----
-{packages_toml}
----
 
-CHEZMOI CONFIG DIRS (implies app installed):
-{data['config_dirs']}
+def find_drift(data, manifest):
+    """Installed-but-untracked items, as (kind, name) pairs.
 
-HYPRLAND EXEC APPS:
-{data['hypr_exec']}
+    Config dirs and hypr apps only count when the binary is actually on PATH —
+    a config without the app isn't drift (a system package of that name also
+    counts). Flatpaks are tracked when their app ID appears in any verify
+    command; cargo crates and global npm packages when they match a key or a
+    description word."""
+    names = known_names(manifest)
+    verify_text = "\n".join(e.get("verify", "") for e in manifest.values())
+    system_pkgs = set(data["rpm_pkgs"].splitlines()) | set(data["pacman_pkgs"].splitlines())
+    drift = []
 
-HYPRLAND KEYBIND APPS:
-{data['hypr_binds']}
+    for kind in ("config_dirs", "hypr_exec", "hypr_binds"):
+        for name in data[kind].splitlines():
+            if name.lower() not in names and (shutil.which(name) or name in system_pkgs):
+                drift.append((kind, name))
 
-INSTALLED FLATPAKS:
-{data['flatpak_apps']}
+    for app_id in data["flatpak_apps"].splitlines():
+        if app_id and app_id not in verify_text:
+            drift.append(("flatpak_apps", app_id))
 
-INSTALLED CARGO TOOLS:
-{data['cargo_tools']}
+    for kind in ("cargo_tools", "npm_globals"):
+        for name in data[kind].splitlines():
+            if name and name.lower() not in names and name.rsplit("/", 1)[-1].lower() not in names:
+                drift.append((kind, name))
 
-MANIFEST ENTRY KEYS:
-{data['manifest_pkgs']}
+    # One report line per name, first kind wins (a config dir is usually
+    # also a hypr exec app).
+    seen = set()
+    return [(k, n) for k, n in drift if not (n in seen or seen.add(n))]
 
---- JOB 1: Missing manifest packages ---
-1. Detect distro in ONE call: `command -v dnf && echo fedora || echo arch`
-2. Check ONLY entries where profile = "common" or profile = "{profile}". Skip optional = true entries.
-3. For each entry, use its `verify` field to check if installed. Batch into ONE Bash call:
-   `for cmd in "cmd1" "cmd2"; do eval "$cmd" &>/dev/null || echo "MISSING: $cmd"; done`
-4. If no `verify` field, infer the binary name from the entry key and run `command -v <key>`.
-5. Report ONLY entries that are genuinely not installed.
 
---- JOB 2: Untracked drift ---
-6. Cross-reference config dirs + hypr apps + flatpaks + cargo tools against manifest entry keys.
-7. Config dir name maps to entry key (btop→btop, zed→zed, etc.). hyprnotice is its own
-   tracked entry installed via the run_once_after_31-install-hyprnotice.sh chezmoi script.
-8. SKIP: sub-binaries bundled with tracked entries (e.g. hyprnotice-ctl is part of the hyprnotice install).
-9. Flatpak: flag only if app ID doesn't appear in any verify field in the manifest.
-10. Cargo: flag only if crate name doesn't match any manifest key or appear in any description.
-11. Use ONE Bash call to confirm a flagged item is actually installed before reporting it.
+DRIFT_LABELS = {
+    "config_dirs": "chezmoi config dir",
+    "hypr_exec": "hyprland exec",
+    "hypr_binds": "hyprland keybind",
+    "flatpak_apps": "flatpak",
+    "cargo_tools": "cargo crate",
+    "npm_globals": "global npm package",
+}
 
-Output format:
-- Section 1: "Missing Manifest Packages" — one line per entry key
-- Section 2: "Untracked Dependencies" — one line each with brief note
-- If both empty: output exactly 'All packages up to date. No drift detected.'"""
 
-    print("\n=== Full package audit + drift check ===")
-    result = run_claude_check(claude_bin, system_prompt,
-                              f"Run full audit for the {profile} profile: check manifest packages AND find untracked drift.")
+def _missing_note(result):
+    note = ""
+    if result["status"] == "timeout":
+        note = " (verify timed out)"
+    elif result["status"] == "error":
+        note = " (verify could not run)"
+    if result.get("blocked_by"):
+        note += f" (needs {', '.join(result['blocked_by'])}, also missing)"
+    return note
 
-    if re.search(r"all.*up to date.*no.*drift|no.*missing.*no.*drift", result, re.IGNORECASE):
-        return
 
+def format_findings(missing, drift, results):
+    lines = []
+    if missing:
+        lines.append("Missing Manifest Packages")
+        lines.extend(f"  {key}{_missing_note(results[key])}" for key in missing)
+    if drift:
+        if lines:
+            lines.append("")
+        lines.append("Untracked Dependencies")
+        lines.extend(f"  {name} ({DRIFT_LABELS[kind]})" for kind, name in drift)
+    return "\n".join(lines)
+
+
+PROMPT_BUDGET = 6000  # bytes of JSON audit context sent to haiku
+
+
+def _compact(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_audit_context(manifest, profile, missing, drift, results, budget=PROMPT_BUDGET):
+    """Compact JSON context for the haiku prompts: the precomputed findings
+    plus just enough of this profile's manifest to judge them — never the
+    raw packages.toml or inventories.
+
+    Sections are in descending priority; while over `budget` bytes the
+    lowest-priority optional section is dropped, then the longest untracked
+    list is halved. Returns (json text, [what was dropped or trimmed])."""
+    entries = dict(select_entries(manifest, profile, include_optional=True))
+    missing_info = {}
+    for key in missing:
+        info = {"status": results[key]["status"], "verify": entry_verify(key, manifest[key])}
+        if results[key].get("blocked_by"):
+            info["blocked_by"] = results[key]["blocked_by"]
+        missing_info[key] = info
+    untracked = {}
+    for kind, name in drift:
+        untracked.setdefault(kind, []).append(name)
+
+    context = {
+        "profile": profile,
+        "missing": missing_info,
+        "untracked": untracked,
+        # the rest: for spotting untracked items covered under another name
+        "tracked": {k: e.get("description", "") for k, e in entries.items() if k not in missing_info},
+        "tracked_verify": {k: e["verify"] for k, e in entries.items()
+                           if k not in missing_info and e.get("verify")},
+    }
+    optional = ["tracked_verify", "tracked"]
+    trimmed = []
+
+    text = _compact(context)
+    while len(text.encode()) > budget:
+        if optional:
+            section = optional.pop(0)
+            del context[section]
+            trimmed.append(section)
+        else:
+            kind = max(untracked, key=lambda k: len(untracked[k]), default=None)
+            if kind is None or len(untracked[kind]) <= 1:
+                break
+            keep = len(untracked[kind]) // 2
+            trimmed.append(f"{len(untracked[kind]) - keep} {kind}")
+            untracked[kind] = untracked[kind][:keep]
+        text = _compact(context)
+    return text, trimmed
+
+
+AUDIT_SNAPSHOT = CACHE_DIR / "audit-snapshot.json"
+
+
+def _digest(obj):
+    return hashlib.sha256(_compact(obj).encode()).hexdigest()[:16]
+
+
+def build_snapshot(manifest, profile, data, missing, drift, results):
+    """Normalized, content-hashed view of one audit: a digest per resolved
+    entry (its TOML plus verify outcome) and per drift input list, and the
+    findings they produced."""
+    items = {f"entry:{key}": _digest([entry, results[key]["status"]])
+             for key, entry in select_entries(manifest, profile)}
+    for kind in DRIFT_LABELS:
+        items[f"inputs:{kind}"] = _digest(sorted(filter(None, data[kind].splitlines())))
+    return {
+        "digest": _digest(items),
+        "items": items,
+        "missing": {key: items[f"entry:{key}"] for key in missing},
+        "untracked": sorted([kind, name] for kind, name in drift),
+    }
+
+
+def load_snapshot(profile):
+    try:
+        data = json.loads(AUDIT_SNAPSHOT.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != 1:
+        return None
+    snap = data.get("profiles", {}).get(profile)
+    return snap if isinstance(snap, dict) else None
+
+
+def save_snapshot(profile, snapshot, review):
+    """Persist this run's snapshot with the review of its findings (None when
+    there was none to reuse, so the next run reviews everything)."""
+    try:
+        data = json.loads(AUDIT_SNAPSHOT.read_text())
+        if not isinstance(data, dict) or data.get("version") != 1:
+            data = {}
+    except (OSError, ValueError):
+        data = {}
+    data.setdefault("profiles", {})[profile] = {**snapshot, "review": review, "at": int(time.time())}
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = AUDIT_SNAPSHOT.with_suffix(".tmp")
+        tmp.write_text(json.dumps({**data, "version": 1}))
+        os.replace(tmp, AUDIT_SNAPSHOT)
+    except OSError:
+        pass
+
+
+def audit_delta(prev, snapshot, missing, drift):
+    """Split this run's findings against the previous audit's.
+
+    Returns (new missing keys, new drift pairs, carried review). A missing
+    entry is new unless it was missing last time with the same TOML; a drift
+    pair unless it was reported last time. Carried review holds the previous
+    notes for the findings that aren't new — items the previous review dropped
+    as false positives stay dropped. Without a usable previous review,
+    everything is new."""
+    review = (prev or {}).get("review")
+    if not isinstance(review, dict):
+        return missing, drift, {"missing": [], "untracked": []}
+    old_missing = prev.get("missing", {})
+    old_drift = {tuple(pair) for pair in prev.get("untracked", [])}
+    new_missing = [k for k in missing if old_missing.get(k) != snapshot["missing"][k]]
+    new_drift = [(kind, name) for kind, name in drift if (kind, name) not in old_drift]
+    kept_missing = set(missing) - set(new_missing)
+    kept_names = {name for kind, name in drift if (kind, name) in old_drift}
+    carried = {
+        "missing": [i for i in review.get("missing", [])
+                    if isinstance(i, dict) and i.get("key") in kept_missing],
+        "untracked": [i for i in review.get("untracked", [])
+                      if isinstance(i, dict) and i.get("name") in kept_names],
+    }
+    return new_missing, new_drift, carried
+
+
+def describe_delta(prev, snapshot):
+    """One line naming what changed since the previous snapshot."""
+    if prev is None:
+        return "no previous audit"
+    old, new = prev.get("items", {}), snapshot["items"]
+    changed = sorted(k for k in old.keys() | new.keys() if old.get(k) != new.get(k))
+    if not changed:
+        return "no change since last audit"
+    shown = ", ".join(k.split(":", 1)[1] for k in changed[:6])
+    more = f" (+{len(changed) - 6} more)" if len(changed) > 6 else ""
+    return f"{len(changed)} changed since last audit: {shown}{more}"
+
+
+def prompt_size(*parts):
+    """Byte count and rough token estimate (~4 bytes/token) of a prompt."""
+    size = sum(len(p.encode()) for p in parts)
+    return f"{size} bytes (~{(size + 3) // 4} tokens)"
+
+
+def offer_fixer(claude_bin, profile, context, report):
+    """Offer an interactive Claude session to update packages.toml from the
+    audit `report`, with the full audit `context`."""
     response = prompt_user("Would you like Claude to help fix these issues?")
     if response.lower().startswith("y"):
         interactive_prompt = f"""You are a packages.toml manifest editor. Your job is to update {REGISTRY} based on audit findings.
 
-packages.toml:
----
-{packages_toml}
----
+Audit context (compact JSON, see the audit report for details):
+{context}
 
 Rules:
-- Your PRIMARY action is editing packages.toml using the Edit tool.
+- Your PRIMARY action is editing packages.toml using the Edit tool. Read only the part of it you are about to change.
 - For untracked apps: add them to the appropriate [common/work/personal.*] section following the existing TOML format. Include both fedora and arch sub-tables where applicable.
 - For missing packages: they are already in the manifest — do NOT re-add them. Just confirm they're present and let the user know they need to be installed.
 - Ask the user item-by-item what they want to do. Do not batch-edit without confirmation.
 - Do not explore the filesystem, run installs, or do anything outside editing packages.toml unless the user explicitly asks."""
 
         seed = (
-            f"Audit report for the {profile} profile:\n\n{result}\n\n"
+            f"Audit report for the {profile} profile:\n\n{report}\n\n"
             "Briefly list the untracked items and missing packages, then ask me which ones to add/fix."
         )
+        print(f"[package-check] fixer prompt: {prompt_size(interactive_prompt, seed)}")
         run_claude_interactive(claude_bin, interactive_prompt, seed)
 
 
-def main():
-    if not sys.stdin.isatty():
-        sys.exit(0)
+def run_audit(claude_bin, profile, args):
+    """Post-apply: check manifest packages are installed AND find untracked drift.
+
+    Both checks run locally; haiku only sees the findings, and only when
+    there are any."""
+    with phase("drift"):
+        data = collect_drift_data(use_index=not args.no_cache)
+    manifest = load_manifest(data["packages_toml"])
+
+    print("\n=== Full package audit + drift check ===")
+    for c in data["collectors"]:
+        if c["status"] in ("error", "timeout"):
+            print(f"[package-check] {c['name']} inventory {c['status']}: {c['error']}")
+    cache = None if args.no_cache else VerifyCache(profile)
+    with phase("verify"):
+        missing, results = check_missing(manifest, profile, args.jobs, args.timeout, cache)
+    print(f"[package-check] {probe_summary(results)}")
+    if cache and args.cache_stats:
+        print(f"[package-check] {cache.summary()}")
+    with phase("find_drift"):
+        drift = find_drift(data, manifest)
+
+    snapshot = build_snapshot(manifest, profile, data, missing, drift, results)
+    prev = None if args.no_cache else load_snapshot(profile)
+    print(f"[package-check] {describe_delta(prev, snapshot)}")
+    if PROFILER:
+        PROFILER.extra["snapshot"] = {"previous": prev is not None,
+                                      "unchanged": prev is not None and prev.get("digest") == snapshot["digest"]}
+    if not missing and not drift:
+        save_snapshot(profile, snapshot, {"missing": [], "untracked": []})
+        print("All packages up to date. No drift detected.")
+        return
+
+    findings = format_findings(missing, drift, results)
+    print(findings)
+
+    new_missing, new_drift, carried = audit_delta(prev, snapshot, missing, drift)
+    if not new_missing and not new_drift:
+        # Same findings as last time: reuse that review, no model call.
+        save_snapshot(profile, snapshot, carried)
+        if not carried["missing"] and not carried["untracked"]:
+            print("All packages up to date. No drift detected (per last review).")
+            return
+        report = format_review(carried)
+        print(f"\n{report}")
+        print("[package-check] findings unchanged since last audit; --no-cache to re-review")
+        if claude_bin:
+            context, _ = build_audit_context(manifest, profile, missing, drift, results,
+                                             args.prompt_budget)
+            offer_fixer(claude_bin, profile, context, report)
+        return
 
-    claude_bin = find_claude()
     if not claude_bin:
-        print("[package-check] Claude CLI not found, skipping")
+        # Nothing reviewed the new findings: keep the snapshot for the delta
+        # report, but no review to reuse.
+        save_snapshot(profile, snapshot, None)
+        return
+
+    # Only what changed goes to the model; the rest keeps its last review.
+    context, trimmed = build_audit_context(manifest, profile, new_missing, new_drift, results,
+                                           args.prompt_budget)
+    carried_note = ""
+    if len(new_missing) + len(new_drift) < len(missing) + len(drift):
+        carried_note = ("\nOnly findings that are new since the last audit are listed; "
+                        "earlier ones were already reviewed.")
+
+    system_prompt = f"""You are a system package auditor. Be concise and fast — minimize Bash calls.
+
+A local audit already ran every applicable `verify` command from packages.toml
+and cross-referenced installed apps against it. Its findings, as compact JSON:
+- missing: entry key -> failed verify command, status (missing/timeout/error)
+  and blocked_by: failed dependencies it needs, if any
+- untracked: drift kind -> installed names no manifest entry mentions
+- tracked: the profile's other entries -> description (may be omitted){carried_note}
+
+{context}
+
+Your job is to explain these findings, not to redo the audit:
+1. Missing entries failed their `verify` command. Say in one line each what the
+   entry provides and, if obvious, why the check might fail (e.g. renamed binary).
+2. Untracked items are heuristic. Drop false positives: sub-binaries bundled with
+   tracked entries (e.g. hyprnotice-ctl is part of the hyprnotice install), or
+   apps clearly covered by an entry under another name. Use at most ONE Bash call
+   if you need to confirm something.
+
+Output format — start your reply with exactly one findings block, compact JSON
+on one line, then at most two sentences of summary:
+<findings>{{"missing":[{{"key":"<entry key>","note":"<one line>"}}],"untracked":[{{"name":"<name>","note":"<one line>"}}]}}</findings>
+Use empty lists for anything that doesn't survive review."""
+    user_prompt = f"Explain the audit findings for the {profile} profile."
+
+    note = f", trimmed: {', '.join(trimmed)}" if trimmed else ""
+    print(f"[package-check] audit prompt: {prompt_size(system_prompt, user_prompt)}{note}")
+    with phase("claude_check"):
+        review = run_claude_check(claude_bin, system_prompt, user_prompt)
+    print(f"[package-check] haiku: {review.summary()}")
+
+    if review.findings is not None:
+        merged = {"missing": carried["missing"] + list(review.findings["missing"]),
+                  "untracked": carried["untracked"] + list(review.findings["untracked"])}
+        save_snapshot(profile, snapshot, merged)
+        if not merged["missing"] and not merged["untracked"]:
+            print("All packages up to date. No drift detected.")
+            return
+        result = format_review(merged)
+        print(f"\n{result}")
+    else:
+        # No (parseable) findings block: fall back to the prose answer, and
+        # leave nothing to reuse so the next run reviews everything again.
+        save_snapshot(profile, snapshot, None)
+        result = review.text()
+        print(f"\n{result}")
+        if re.search(r"all.*up to date.*no.*drift|no.*missing.*no.*drift", result, re.IGNORECASE):
+            return
+
+    context, _ = build_audit_context(manifest, profile, missing, drift, results, args.prompt_budget)
+    offer_fixer(claude_bin, profile, context, result or findings)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Audit packages.toml against the live system.")
+    parser.add_argument("--jobs", type=int, default=VERIFY_JOBS,
+                        help=f"verify probes to run at once (default {VERIFY_JOBS})")
+    parser.add_argument("--timeout", type=float, default=VERIFY_TIMEOUT,
+                        help=f"seconds before a verify probe is killed (default {VERIFY_TIMEOUT})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-probe every entry, rescan the config tree and re-review all findings, ignoring the caches")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="print verify cache hits/misses/evictions after probing")
+    parser.add_argument("--prompt-budget", type=int, default=PROMPT_BUDGET,
+                        help=f"max bytes of audit context sent to haiku (default {PROMPT_BUDGET})")
+    parser.add_argument("--profile-phases", nargs="?", const="-", metavar="FILE",
+                        help="record wall/CPU time and subprocess count per phase and write "
+                             "them as JSON to FILE (default stderr); also runs without a TTY")
+    return parser.parse_args()
+
+
+def main():
+    global PROFILER, PROFILE_OUTPUT
+    args = parse_args()
+    if args.profile_phases:
+        PROFILER, PROFILE_OUTPUT = PhaseProfiler(), args.profile_phases
+    elif not sys.stdin.isatty():
         sys.exit(0)
 
     if not REGISTRY.is_file():
         sys.exit(0)
 
+    claude_bin = find_claude()
+    if not claude_bin:
+        print("[package-check] Claude CLI not found, reporting local findings only")
+
     profile = detect_profile()
-    run_audit(claude_bin, profile)
+    try:
+        run_audit(claude_bin, profile, args)
+    finally:
+        emit_profile()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+// Shared header channel: every pane's header in one fixed-layout file that
+// renderers mmap, so they can tell whether anything changed by reading one
+// counter instead of opening and parsing a JSON file per pane:
+//   $XDG_RUNTIME_DIR/terminal-header/headers.bin
+// The per-pane JSON files are still written and stay the contract; this is
+// an optional fast path (kitty's header_state.py reads it when present).
+//
+// Layout, little-endian, fixed size (HEAD_SIZE + CAPACITY * RECORD_SIZE):
+//   0   'THC1'                magic
+//   4   u32 record size       RECORD_SIZE
+//   8   u64 generation        seqlock: odd while a write is in progress
+//   16  u32 record count
+//   20  u32 capacity
+//   24  u32 flags             FLAG_TRUNCATED: more panes than capacity
+//   28  u32 reserved
+//   32  records
+// Record:
+//   0   u16 key length
+//   2   u16 header length     0 = no header, HEADER_IN_JSON = too long, read
+//                             the pane's JSON file instead
+//   4   u32 reserved
+//   8   f64 updatedAtMs
+//   16  key                   KEY_MAX bytes
+//   112 header                HEADER_MAX bytes, UTF-8
+//
+// Writers bump the generation to odd, rewrite the records and count, then
+// bump it to even; readers retry when it is odd or moved under them.
+
+import {
+  closeSync,
+  fstatSync,
+  ftruncateSync,
+  openSync,
+  readSync,
+  renameSync,
+  unlinkSync,
+  writeSync,
+} from 'node:fs';
+
+const MAGIC = 'THC1';
+const HEAD_SIZE = 32;
+const RECORD_SIZE = 512;
+const KEY_MAX = 96;
+const HEADER_MAX = RECORD_SIZE - 16 - KEY_MAX;
+const CAPACITY = 256;
+const FLAG_TRUNCATED = 1;
+const HEADER_IN_JSON = 0xffff;
+
+export interface ChannelEntry {
+  paneKey: string;
+  header: string | null;
+  atMs: number;
+}
+
+let fd: number | undefined;
+let generation = 0n;
+
+function open(path: string): number {
+  const size = HEAD_SIZE + CAPACITY * RECORD_SIZE;
+  const head = Buffer.alloc(HEAD_SIZE);
+  let handle: number | undefined;
+  try {
+    handle = openSync(path, 'r+');
+  } catch {
+    // Missing or unreadable: created below.
+  }
+  if (handle !== undefined) {
+    if (fstatSync(handle).size === size) {
+      readSync(handle, head, 0, HEAD_SIZE, 0);
+    }
+    if (head.toString('latin1', 0, 4) === MAGIC && head.readUInt32LE(4) === RECORD_SIZE
+        && head.readUInt32LE(20) === CAPACITY) {
+      // Continue the existing generation so mapped readers see a change.
+      generation = head.readBigUInt64LE(8);
+      generation += generation & 1n;
+      return handle;
+    }
+    closeSync(handle);
+  }
+  return create(path, size);
+}
+
+// A fresh file renamed over the old one, never resized in place: renderers
+// may have the old one mapped, and touching a mapping past a shrunken end
+// is SIGBUS. They notice the new inode and remap.
+function create(path: string, size: number): number {
+  const tmp = `${path}.${process.pid}.tmp`;
+  const handle = openSync(tmp, 'w+', 0o600);
+  try {
+    ftruncateSync(handle, size);
+    const head = Buffer.alloc(HEAD_SIZE);
+    head.write(MAGIC, 0, 'latin1');
+    head.writeUInt32LE(RECORD_SIZE, 4);
+    head.writeUInt32LE(CAPACITY, 20);
+    writeSync(handle, head, 0, HEAD_SIZE, 0);
+    renameSync(tmp, path);
+  } catch (err) {
+    closeSync(handle);
+    try {
+      unlinkSync(tmp);
+    } catch {
+      // Never created or already renamed.
+    }
+    throw err;
+  }
+  generation = 0n;
+  return handle;
+}
+
+function writeGeneration(handle: number): void {
+  const buf = Buffer.alloc(8);
+  buf.writeBigUInt64LE(generation);
+  writeSync(handle, buf, 0, 8, 8);
+}
+
+export function publishChannel(path: string, entries: ChannelEntry[]): void {
+  if (fd === undefined) fd = open(path);
+  const count = Math.min(entries.length, CAPACITY);
+  const records = Buffer.alloc(count * RECORD_SIZE);
+  for (let i = 0; i < count; i++) {
+    const { paneKey, header, atMs } = entries[i];
+    const at = i * RECORD_SIZE;
+    const keyLen = records.write(paneKey, at + 16, KEY_MAX, 'utf8');
+    let headerLen = 0;
+    if (header !== null) {
+      headerLen = Buffer.byteLength(header, 'utf8') <= HEADER_MAX
+        ? records.write(header, at + 16 + KEY_MAX, HEADER_MAX, 'utf8')
+        : HEADER_IN_JSON;
+    }
+    records.writeUInt16LE(keyLen, at);
+    records.writeUInt16LE(headerLen, at + 2);
+    records.writeDoubleLE(atMs, at + 8);
+  }
+  const counts = Buffer.alloc(12);
+  counts.writeUInt32LE(count, 0);
+  counts.writeUInt32LE(CAPACITY, 4);
+  counts.writeUInt32LE(entries.length > CAPACITY ? FLAG_TRUNCATED : 0, 8);
+
+  try {
+    generation += 1n;
+    writeGeneration(fd);
+    writeSync(fd, records, 0, records.length, HEAD_SIZE);
+    writeSync(fd, counts, 0, counts.length, 16);
+    generation += 1n;
+    writeGeneration(fd);
+  } catch (err) {
+    // Reopen (and re-validate) next time; readers fall back to JSON while
+    // the generation is left odd.
+    try {
+      closeSync(fd);
+    } catch {
+      // Already gone.
+    }
+    fd = undefined;
+    throw err;
+  }
+}
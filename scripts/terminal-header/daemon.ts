@@ -2,6 +2,7 @@
 // Terminal header daemon: snapshots every kitty window and wezterm pane,
 // runs each through the section resolver, and writes
 //   $XDG_RUNTIME_DIR/terminal-header/pane-<key>.json  { header, updatedAtMs }
+// (mirrored into headers.bin, an mmap-able table — see channel.ts).
 // Terminals are dumb renderers of that file. Inputs (user vars, agent state
 // files, claude correlation, pane summaries) are produced elsewhere — by the
 // claude hooks, agent runner/bridge, and pane-summarizer.service.
@@ -13,6 +14,7 @@ import {
 import { join } from 'node:path';
 import type { AgentState, SectionContext } from './types.ts';
 import { resolveHeader } from './resolver.ts';
+import { publishChannel } from './channel.ts';
 import { TARGETS } from './targets/index.ts';
 
 const TICK_MS = 1_500;
@@ -173,6 +175,8 @@ function tick(): void {
   };
 
   const seen = new Set<string>();
+  let written = false;
+  const changed = new Map<string, string[]>();
   const snapshots = TARGETS.filter((t) => t.available()).flatMap((t) => {
     try {
       return t.listPanes();
@@ -193,6 +197,12 @@ function tick(): void {
     if (prev && prev.header === header && nowMs - prev.atMs < RESTAMP_MS) continue;
     writeJson(headerPath(snapshot.paneKey), { header, updatedAtMs: nowMs });
     lastWritten.set(snapshot.paneKey, { header, atMs: nowMs });
+    written = true;
+    if ((prev?.header ?? null) !== header) {
+      const keys = changed.get(snapshot.terminal) ?? [];
+      keys.push(snapshot.paneKey);
+      changed.set(snapshot.terminal, keys);
+    }
   }
 
   // Drop output files for panes that no longer exist.
@@ -204,6 +214,30 @@ function tick(): void {
         // Best effort.
       }
       lastWritten.delete(key);
+      written = true;
+    }
+  }
+
+  // Mirror everything into the mmap channel (same data, one file) before
+  // pushing, so a renderer woken by the push sees the new generation.
+  if (written) {
+    try {
+      publishChannel(join(runtimeRoot('terminal-header'), 'headers.bin'),
+        [...lastWritten].map(([paneKey, { header, atMs }]) => ({ paneKey, header, atMs })));
+    } catch {
+      // Renderers fall back to the JSON files.
+    }
+  }
+
+  // Push header changes (not restamps) to renderers that accept them.
+  for (const target of TARGETS) {
+    const keys = changed.get(target.name);
+    if (keys && target.headersChanged) {
+      try {
+        target.headersChanged(keys);
+      } catch {
+        // Renderers fall back to polling.
+      }
     }
   }
 }
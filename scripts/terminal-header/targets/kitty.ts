@@ -1,4 +1,4 @@
-import { execFileSync } from 'node:child_process';
+import { execFile, execFileSync } from 'node:child_process';
 import { readlinkSync } from 'node:fs';
 import type { ForegroundProcess, PaneSnapshot, TerminalTarget } from '../types.ts';
 import { binaryOnPath } from './util.ts';
@@ -8,6 +8,10 @@ import { binaryOnPath } from './util.ts';
 // allow_remote_control yes). Pane keys are kitty-<kitty pid>-<window id> —
 // the pid disambiguates instances, since every instance's first window is
 // id 1. `kitten @ ls` exposes user vars and foreground processes for free.
+//
+// Header changes are pushed back over the same socket: setting the
+// terminal_header user var fires kitty's on_set_user_var watcher, which
+// re-runs the renderer's visibility check immediately (watcher.py).
 
 let known: boolean | undefined;
 
@@ -62,4 +66,16 @@ export const kittyTarget: TerminalTarget = {
     }
     return snapshots;
   },
+
+  headersChanged(paneKeys: string[]): void {
+    const pids = new Set(paneKeys.map((key) => key.split('-')[1]).filter(Boolean));
+    const stamp = String(Date.now());
+    for (const pid of pids) {
+      execFile('kitten', ['@', '--to', `unix:@kitty-${pid}`, 'set-user-vars', `terminal_header=${stamp}`], {
+        timeout: 2_000,
+      }, () => {
+        // Best effort: the renderer's fallback timer catches missed pushes.
+      });
+    }
+  },
 };
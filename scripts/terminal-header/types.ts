@@ -64,4 +64,8 @@ export interface TerminalTarget {
   /** Snapshot every live pane. Must handle "installed but not running" by
    *  returning []. */
   listPanes(): PaneSnapshot[];
+  /** Optional push: called once per tick with this target's pane keys whose
+   *  header text changed (appeared, changed, or cleared), so the renderer can
+   *  redraw at once instead of polling. Fire-and-forget; must not block. */
+  headersChanged?(paneKeys: string[]): void;
 }